@@ -1,19 +1,34 @@
 from django.contrib import admin
 from blog.models import Post, Tag, Comment
+from blog.search import search_comments, search_posts
+
+class FullTextSearchMixin:
+    """Поиск в админке через полнотекстовый индекс вместо LIKE по search_fields"""
+    search_function = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        found_ids = self.search_function(search_term)
+        if found_ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=found_ids), False
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['author', 'post', 'published_at']
     list_select_related = ['author', 'post']
     raw_id_fields = ['author', 'post']
     search_fields = ['text']
+    search_function = staticmethod(search_comments)
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['title', 'author', 'published_at']
     raw_id_fields = ['author', 'tags']
     list_filter = ['published_at']
     search_fields = ['title', 'text']
+    search_function = staticmethod(search_posts)
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
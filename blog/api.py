@@ -0,0 +1,181 @@
+"""
+JSON API только для чтения: посты, посты тега, пост и его комментарии.
+
+Списки строятся через values() по запрошенным в ?fields= полям, поэтому
+ненужные столбцы, JOIN с автором и запрос тегов не выполняются вовсе.
+Страницы листаются курсором, ответы отдаются с ETag.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.db.models.functions import Left
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from blog.models import Comment, Post
+from blog.pagination import InvalidCursor, paginate
+from blog.slugs import get_post_by_slug, get_tag_by_slug
+from blog.views import COMMENTS_PER_PAGE, POSTS_PER_PAGE, build_etag, post_detail_etag
+
+TEASER_LENGTH = 200
+
+# Поле ответа → столбец или выражение для values()
+POST_COLUMNS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'text': 'text',
+    'teaser_text': Left('text', TEASER_LENGTH),
+    'author': 'author__username',
+    'image_url': 'image',
+    'published_at': 'published_at',
+    'likes_amount': 'likes_count',
+    'comments_amount': 'comments_count',
+}
+POST_FIELDS = [*POST_COLUMNS, 'tags']
+LIST_FIELDS = [field for field in POST_FIELDS if field != 'text']
+CURSOR_KEYS = ('published_at', 'id')
+
+
+class InvalidFields(Exception):
+    pass
+
+
+def error_response(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def parse_fields(request, allowed, default):
+    if 'fields' not in request.GET:
+        return default
+    fields = [field for field in request.GET['fields'].split(',') if field]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise InvalidFields(f'Неизвестные поля: {", ".join(unknown)}' if unknown else 'Пустой список полей')
+    return fields
+
+
+def select_post_columns(queryset, fields):
+    """queryset.values() только со столбцами для fields и ключами курсора"""
+    columns, expressions = [], {}
+    for field in fields:
+        column = POST_COLUMNS.get(field)
+        if isinstance(column, str):
+            columns.append(column)
+        elif column is not None:
+            expressions[f'_{field}'] = column
+    return queryset.values(*dict.fromkeys([*columns, *CURSOR_KEYS]), **expressions)
+
+
+def get_tags_by_post(post_ids):
+    """Теги постов одним запросом к промежуточной таблице"""
+    links = Post.tags.through.objects.filter(post_id__in=post_ids) \
+        .order_by('pk') \
+        .values_list('post_id', 'tag__title', 'tag__slug')
+    tags_by_post = {post_id: [] for post_id in post_ids}
+    for post_id, title, slug in links:
+        tags_by_post[post_id].append({'title': title, 'slug': slug})
+    return tags_by_post
+
+
+def serialize_post_rows(rows, fields):
+    tags_by_post = get_tags_by_post([row['id'] for row in rows]) if 'tags' in fields else {}
+    serialized = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == 'tags':
+                item['tags'] = tags_by_post[row['id']]
+            elif field == 'image_url':
+                item['image_url'] = default_storage.url(row['image']) if row['image'] else None
+            elif isinstance(POST_COLUMNS[field], str):
+                item[field] = row[POST_COLUMNS[field]]
+            else:
+                item[field] = row[f'_{field}']
+        serialized.append(item)
+    return serialized
+
+
+def posts_response(request, posts):
+    try:
+        fields = parse_fields(request, POST_FIELDS, LIST_FIELDS)
+        page = paginate(
+            select_post_columns(posts, fields),
+            request.GET.get('cursor'),
+            POSTS_PER_PAGE,
+            keys=CURSOR_KEYS,
+        )
+    except InvalidFields as error:
+        return error_response(str(error))
+    except InvalidCursor:
+        return error_response('Некорректный курсор')
+
+    return JsonResponse({
+        'results': serialize_post_rows(page.items, fields),
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def api_etag(request, *args, **kwargs):
+    return build_etag(request)
+
+
+@require_GET
+@condition(etag_func=api_etag)
+def posts(request):
+    return posts_response(request, Post.objects.all())
+
+
+@require_GET
+@condition(etag_func=api_etag)
+def tag_posts(request, tag_slug):
+    tag = get_tag_by_slug(tag_slug)
+    if tag is None:
+        return error_response('Тег не найден', status=404)
+    return posts_response(request, Post.objects.filter(tags=tag['id']))
+
+
+@require_GET
+@condition(etag_func=post_detail_etag)
+def post_detail(request, slug):
+    try:
+        fields = parse_fields(request, POST_FIELDS, POST_FIELDS)
+    except InvalidFields as error:
+        return error_response(str(error))
+
+    post = get_post_by_slug(slug)
+    if post is None:
+        return error_response('Пост не найден', status=404)
+    row = select_post_columns(Post.objects.filter(pk=post['id']), fields).first()
+    if row is None:
+        return error_response('Пост не найден', status=404)
+    return JsonResponse(serialize_post_rows([row], fields)[0])
+
+
+@require_GET
+@condition(etag_func=api_etag)
+def post_comments(request, slug):
+    post = get_post_by_slug(slug)
+    if post is None:
+        return error_response('Пост не найден', status=404)
+    post_id = post['id']
+
+    comments = Comment.objects.filter(post_id=post_id) \
+        .values('id', 'text', 'published_at', author_name=F('author__username'))
+    try:
+        page = paginate(comments, request.GET.get('cursor'), COMMENTS_PER_PAGE, descending=False)
+    except InvalidCursor:
+        return error_response('Некорректный курсор')
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': comment['id'],
+                'author': comment['author_name'],
+                'text': comment['text'],
+                'published_at': comment['published_at'],
+            }
+            for comment in page.items
+        ],
+        'next_cursor': page.next_cursor,
+    })
@@ -0,0 +1,124 @@
+"""
+Асинхронные версии страниц для запуска через ASGI.
+
+ORM и кэш синхронные, поэтому каждая часть страницы выполняется в своём
+потоке из пула, а виджеты сайдбара и основное содержимое загружаются
+одновременно через asyncio.gather.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+
+from blog import views
+from blog.models import Post
+
+
+def run_in_thread(func):
+    """Асинхронная обёртка над синхронной функцией, работающая в пуле потоков
+
+    thread_sensitive=False нужен, чтобы части страницы выполнялись
+    параллельно, а не по очереди в одном потоке. Соединения с базой в
+    потоках пула закрываются по тем же правилам CONN_MAX_AGE, что и в
+    обычном запросе.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+def condition(etag_func):
+    """Аналог django.views.decorators.http.condition с etag_func в потоке"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await run_in_thread(etag_func)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+async def get_popular_tags():
+    return await run_in_thread(views.get_popular_tags)()
+
+
+async def get_most_popular_posts():
+    return await run_in_thread(views.get_most_popular_posts)()
+
+
+@condition(etag_func=views.index_etag)
+async def index(request):
+    cursor = request.GET.get('cursor')
+    page, most_popular_posts, popular_tags = await asyncio.gather(
+        run_in_thread(views.get_posts_page)(
+            'all', cursor, lambda: views.build_posts_page(Post.objects.all(), cursor),
+        ),
+        get_most_popular_posts(),
+        get_popular_tags(),
+    )
+
+    context = {
+        'most_popular_posts': most_popular_posts,
+        'page_posts': page['posts'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
+        'popular_tags': popular_tags,
+    }
+    return await run_in_thread(render)(request, 'index.html', context)
+
+
+@cache_control(private=True)
+@condition(etag_func=views.post_detail_etag)
+async def post_detail(request, slug):
+    post, popular_tags, most_popular_posts = await asyncio.gather(
+        run_in_thread(views.get_post_with_comments)(slug),
+        get_popular_tags(),
+        get_most_popular_posts(),
+    )
+
+    context = {
+        'post': post,
+        'popular_tags': popular_tags,
+        'most_popular_posts': most_popular_posts,
+    }
+    return await run_in_thread(render)(request, 'post-details.html', context)
+
+
+@condition(etag_func=views.tag_filter_etag)
+async def tag_filter(request, tag_slug):
+    sort = request.GET.get('sort', 'recent')
+    (tag, page), popular_tags, most_popular_posts = await asyncio.gather(
+        run_in_thread(views.get_tag_posts_page)(tag_slug, request.GET.get('cursor'), sort),
+        get_popular_tags(),
+        get_most_popular_posts(),
+    )
+
+    context = {
+        'tag': tag['title'],
+        'sort': sort,
+        'popular_tags': popular_tags,
+        'posts': page['posts'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
+        'most_popular_posts': most_popular_posts,
+    }
+    return await run_in_thread(render)(request, 'posts-list.html', context)
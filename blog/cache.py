@@ -0,0 +1,142 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from blog.metrics import record_cache_lookup
+
+POSTS = 'posts'
+FEED = 'feed'
+LIKES = 'likes'
+COMMENTS = 'comments'
+TAGS = 'tags'
+RANKING = 'ranking'
+
+GENERATION_KEY = 'blog:generation:{}'
+ENTRY_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_generations(namespaces):
+    """Текущие поколения пространств имён кэша"""
+    keys = {namespace: GENERATION_KEY.format(namespace) for namespace in namespaces}
+    stored = cache.get_many(keys.values())
+
+    generations = {}
+    for namespace, key in keys.items():
+        if key not in stored:
+            cache.add(key, time.time_ns(), None)
+            stored[key] = cache.get(key)
+        generations[namespace] = stored[key]
+    return generations
+
+
+def bump_generation(*namespaces):
+    """Сдвигает поколения, после чего все зависящие от них ключи устаревают"""
+    for namespace in namespaces:
+        key = GENERATION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def bump_generation_on_commit(*namespaces):
+    """Сдвигает поколения после фиксации текущей транзакции"""
+    transaction.on_commit(lambda: bump_generation(*namespaces))
+
+
+def make_key(name, namespaces):
+    generations = get_generations(namespaces)
+    version = '.'.join(str(generations[namespace]) for namespace in sorted(namespaces))
+    return f'blog:{name}:{version}'
+
+
+def _build_with_lock(key, build, store):
+    """Пересчитывает значение в одном воркере, остальные ждут результат"""
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return None
+
+    try:
+        return store(build())
+    finally:
+        cache.delete(lock_key)
+
+
+def get_or_build(name, namespaces, build, timeout=ENTRY_TIMEOUT):
+    """Достаёт значение из кэша, а при промахе пересчитывает его в одном воркере
+
+    Остальные воркеры ждут, пока владелец блокировки положит значение,
+    и считают его сами, только если не дождались.
+    """
+    key = make_key(name, namespaces)
+    value = cache.get(key)
+    if value is not None:
+        record_cache_lookup(name, 'hit')
+        return value
+    record_cache_lookup(name, 'miss')
+
+    def store(value):
+        cache.set(key, value, timeout)
+        return value
+
+    value = _build_with_lock(key, build, store)
+    return build() if value is None else value
+
+
+def _refresh_in_background(lock_key, build, store):
+    def refresh():
+        try:
+            store(build())
+        finally:
+            cache.delete(lock_key)
+            connections.close_all()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def get_or_build_stale(name, namespaces, build, soft_ttl, hard_ttl):
+    """Отдаёт значение из кэша, даже устаревшее, и обновляет его в фоне
+
+    Запись считается свежей soft_ttl секунд и пока не сдвинулись поколения
+    namespaces. Устаревшая запись отдаётся сразу, а пересчёт запускается
+    в фоновом потоке одного воркера. Через hard_ttl секунд запись удаляется
+    из кэша, и следующий запрос пересчитает её синхронно.
+    """
+    key = f'blog:{name}'
+    version = make_key(name, namespaces)
+
+    def store(value):
+        entry = {
+            'value': value,
+            'version': version,
+            'fresh_until': time.time() + soft_ttl,
+        }
+        # Запись перезаписывается на месте, и устаревшая копия в L1 других
+        # процессов запускала бы у них повторный пересчёт
+        replace = getattr(cache, 'replace', cache.set)
+        replace(key, entry, hard_ttl)
+        return entry
+
+    entry = cache.get(key)
+    if entry is None:
+        record_cache_lookup(name, 'miss')
+        entry = _build_with_lock(key, build, store)
+        return build() if entry is None else entry['value']
+
+    is_fresh = entry['version'] == version and time.time() < entry['fresh_until']
+    record_cache_lookup(name, 'hit' if is_fresh else 'stale')
+    lock_key = f'{key}:lock'
+    if not is_fresh and cache.add(lock_key, 1, LOCK_TIMEOUT):
+        _refresh_in_background(lock_key, build, store)
+    return entry['value']
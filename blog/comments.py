@@ -0,0 +1,94 @@
+"""
+Обработка комментария после публикации.
+
+Представление только сохраняет комментарий, а очистку текста, оценку
+спама, пересчёт comments_count, поисковый индекс, сброс кэша и
+уведомление автора поста выполняет process_comment в очереди задач.
+Все шаги можно безопасно повторить, уведомление отправляется последним.
+Задача читает из основной базы, чтобы не опередить репликацию.
+"""
+import logging
+import re
+
+from django.core.mail import send_mail
+from django.db import router, transaction
+from django.utils.html import strip_tags
+
+from blog import cache
+from blog.models import Comment, Post
+from blog.search import get_search_backend
+from sensive_blog.db_router import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+MAX_COMMENT_LENGTH = 2000
+SPAM_THRESHOLD = 1
+SPAM_WORDS = {'casino', 'viagra', 'loan', 'crypto', 'казино', 'ставки', 'кредит', 'заработок'}
+
+
+def sanitize_comment_text(text):
+    """Текст без разметки, лишних пробелов и пустых строк"""
+    text = strip_tags(text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()[:MAX_COMMENT_LENGTH]
+
+
+def score_spam(comment):
+    """Эвристическая оценка: ссылки, стоп-слова, капс и повторы одного текста"""
+    text = comment.text
+    score = 0.4 * len(re.findall(r'https?://|www\.', text, re.IGNORECASE))
+
+    words = re.findall(r'\w+', text.lower())
+    score += 0.5 * sum(word in SPAM_WORDS for word in words)
+
+    letters = [char for char in text if char.isalpha()]
+    if len(letters) >= 20 and sum(char.isupper() for char in letters) / len(letters) > 0.7:
+        score += 0.3
+
+    repeated = Comment.objects.filter(author_id=comment.author_id, text=text) \
+        .exclude(pk=comment.pk) \
+        .exists()
+    if repeated:
+        score += 0.5
+    return score
+
+
+def notify_post_author(comment):
+    author = comment.post.author
+    if not author.email or author.pk == comment.author_id:
+        return
+    send_mail(
+        f'Новый комментарий к посту «{comment.post.title}»',
+        f'{comment.author.username}: {comment.text}',
+        None,
+        [author.email],
+    )
+
+
+def process_comment(comment_id):
+    # Поток очереди не закреплён за основной базой, а реплика может ещё не
+    # получить комментарий. Если его нет и там, задача упадёт и очередь
+    # повторит её позже
+    pin_to_primary()
+    comment = Comment.objects.select_related('author', 'post__author').get(pk=comment_id)
+
+    with transaction.atomic():
+        text = sanitize_comment_text(comment.text)
+        if text != comment.text:
+            Comment.objects.filter(pk=comment.pk).update(text=text)
+            comment.text = text
+
+        if score_spam(comment) >= SPAM_THRESHOLD:
+            logger.info('Комментарий %s удалён как спам', comment.pk)
+            # Счётчик, индекс и кэш обновят сигналы удаления
+            comment.delete()
+            return
+
+        Post.objects.filter(pk=comment.post_id).refresh_comments_count()
+        backend = get_search_backend(router.db_for_write(Comment), model=Comment)
+        if backend:
+            backend.index_comment(comment)
+        cache.bump_generation_on_commit(cache.COMMENTS)
+
+    notify_post_author(comment)
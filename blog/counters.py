@@ -0,0 +1,64 @@
+"""
+Пересчёт сохранённых счётчиков после правок в обход сигналов.
+
+recount_counters исправляет расхождения likes_count, comments_count,
+posts_count и TagPostIndex, finalize_bulk_load вдобавок пересчитывает
+рейтинг и поисковый индекс после импорта или генерации данных. Оба сдвигают
+поколения кэша, иначе виджеты и страницы показывали бы старые числа до
+истечения записей.
+"""
+import io
+
+from django.core.management import call_command
+from django.db import transaction
+
+from blog import cache
+from blog.models import Post, Tag, TagPostIndex
+
+COUNTER_NAMESPACES = (cache.POSTS, cache.LIKES, cache.COMMENTS, cache.TAGS)
+
+
+def iter_pk_batches(queryset, batch_size):
+    """Id объектов пачками по batch_size, без загрузки всей таблицы"""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def recount_counters(batch_size=1000):
+    """Пересчитывает счётчики постов и тегов, возвращает число тех и других"""
+    posts_updated = 0
+    for pks in iter_pk_batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            batch = Post.objects.filter(pk__in=pks)
+            batch.refresh_likes_count()
+            batch.refresh_comments_count()
+            TagPostIndex.objects.rebuild_for_posts(pks)
+        posts_updated += len(pks)
+
+    tags_updated = 0
+    for pks in iter_pk_batches(Tag.objects.all(), batch_size):
+        with transaction.atomic():
+            Tag.objects.filter(pk__in=pks).refresh_posts_count()
+        tags_updated += len(pks)
+
+    cache.bump_generation(*COUNTER_NAMESPACES)
+    return posts_updated, tags_updated
+
+
+def finalize_bulk_load(batch_size=5000, stdout=None):
+    """Счётчики, рейтинг, поисковый индекс и кэш после загрузки в обход ORM"""
+    stdout = stdout or io.StringIO()
+    posts_updated, tags_updated = recount_counters(batch_size)
+    stdout.write(f'Пересчитано постов: {posts_updated}, тегов: {tags_updated}')
+    call_command('recompute_rankings', batch_size=batch_size, stdout=stdout)
+    call_command('rebuild_search_index', stdout=stdout)
+    cache.bump_generation(cache.FEED, cache.RANKING)
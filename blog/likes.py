@@ -0,0 +1,86 @@
+"""
+Лайки через буфер намерений.
+
+Запрос пользователя только дописывает строку в LikeIntent, не трогая
+промежуточную таблицу Post.likes, счётчики и кэш. flush_like_intents
+переносит накопленные намерения пачкой: одна вставка, одно удаление,
+один пересчёт likes_count и один сдвиг поколения LIKES на пачку, сколько
+бы лайков ни пришло на популярный пост.
+"""
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.db.models import Q
+
+from blog import cache
+from blog.models import LikeIntent, Post
+from sensive_blog.db_router import pin_to_primary
+
+FLUSH_LOCK_KEY = 'blog:likes:flush-lock'
+
+
+def record_like_intent(user_id, post_id, liked):
+    LikeIntent.objects.create(user_id=user_id, post_id=post_id, liked=liked)
+
+
+def _apply_batch(intents):
+    # Из нескольких намерений одного пользователя к одному посту
+    # действует последнее
+    latest = {}
+    for intent_id, user_id, post_id, liked in intents:
+        latest[(user_id, post_id)] = liked
+
+    through = Post.likes.through
+    through.objects.bulk_create(
+        [
+            through(user_id=user_id, post_id=post_id)
+            for (user_id, post_id), liked in latest.items() if liked
+        ],
+        ignore_conflicts=True,
+    )
+
+    unliked_by_post = {}
+    for (user_id, post_id), liked in latest.items():
+        if not liked:
+            unliked_by_post.setdefault(post_id, []).append(user_id)
+    if unliked_by_post:
+        condition = Q()
+        for post_id, user_ids in unliked_by_post.items():
+            condition |= Q(post_id=post_id, user_id__in=user_ids)
+        through.objects.filter(condition).delete()
+
+    post_ids = {post_id for _, post_id in latest}
+    Post.objects.filter(pk__in=post_ids).refresh_likes_count()
+    # Удаляются ровно прочитанные строки: намерение с меньшим pk могло
+    # закоммититься уже после чтения пачки и ещё не применено
+    LikeIntent.objects.filter(pk__in=[intent_id for intent_id, *_ in intents]).delete()
+    return len(intents)
+
+
+def flush_like_intents(batch_size=1000):
+    """Применяет все накопленные намерения пачками, возвращает их количество
+
+    Одновременно работает только один перенос, иначе пачки разных
+    процессов могли бы применить лайк и его отмену в обратном порядке.
+    """
+    if not django_cache.add(FLUSH_LOCK_KEY, True, cache.LOCK_TIMEOUT):
+        return 0
+
+    # Намерения читаются из основной базы: с отстающей реплики пачка
+    # пришла бы неполной, а удалены были бы и неприменённые строки
+    pin_to_primary()
+    flushed = 0
+    try:
+        while True:
+            intents = list(
+                LikeIntent.objects.order_by('pk')
+                .values_list('pk', 'user_id', 'post_id', 'liked')[:batch_size]
+            )
+            if not intents:
+                break
+            with transaction.atomic():
+                flushed += _apply_batch(intents)
+                cache.bump_generation_on_commit(cache.LIKES)
+            django_cache.touch(FLUSH_LOCK_KEY, cache.LOCK_TIMEOUT)
+    finally:
+        django_cache.delete(FLUSH_LOCK_KEY)
+    return flushed
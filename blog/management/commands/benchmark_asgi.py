@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+
+from blog.models import Post, Tag
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    return {'rps': len(latencies) / elapsed, 'p99_ms': p99, 'errors': errors}
+
+
+def run_wsgi(paths, concurrency, requests):
+    """Синхронные страницы через WSGI-обработчик, concurrency потоков"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = Client()
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            started_at = time.perf_counter()
+            response = client.get(paths[number % len(paths)])
+            latency = time.perf_counter() - started_at
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(latency)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started_at)
+
+
+async def run_asgi(paths, concurrency, requests):
+    """Асинхронные страницы через ASGI-обработчик, concurrency задач в одном цикле событий"""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        client = AsyncClient()
+        for number in counter:
+            started_at = time.perf_counter()
+            response = await client.get(paths[number % len(paths)])
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started_at)
+            else:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started_at)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает запросы в секунду и p99 страниц чтения под WSGI и ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, concurrency, requests, **options):
+        paths = ['/']
+        post = Post.objects.popular().only('slug').first()
+        if post:
+            paths.append(f'/post/{post.slug}')
+        tag = Tag.objects.popular().only('slug').first()
+        if tag:
+            paths.append(f'/tag/{tag.slug}/')
+
+        deployments = [
+            ('WSGI', 'sensive_blog.urls', lambda: run_wsgi(paths, concurrency, requests)),
+            ('ASGI', 'sensive_blog.asgi_urls', lambda: asyncio.run(run_asgi(paths, concurrency, requests))),
+        ]
+        for title, urlconf, run in deployments:
+            with override_settings(ROOT_URLCONF=urlconf, DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                # Прогрев кэша, чтобы сравнивать одинаковое состояние
+                client = Client()
+                for path in paths:
+                    client.get(path)
+                result = run()
+            self.stdout.write(
+                f'{title}: {result["rps"]:.0f} запросов/с, p99 {result["p99_ms"]:.1f} мс, '
+                f'ошибок {result["errors"]}'
+            )
@@ -0,0 +1,181 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+
+from blog.models import Post, Tag
+from blog.synthetic import DatasetSize, generate_dataset
+from blog.views import serialize_post
+from sensive_blog.cache import TieredCache
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+CACHE_TABLES = [
+    f'"{params["LOCATION"]}"'
+    for params in settings.CACHES.values()
+    if params['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+]
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+        if isinstance(cache, TieredCache):
+            cache.clear_local()
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, iterations, cold):
+    """Время в мс и число SQL-запросов за вызов, кэш перед каждым вызовом
+    очищается при cold и прогревается одним вызовом иначе"""
+    if not cold:
+        func()
+    timings = []
+    queries = []
+    cache_queries = []
+    for _ in range(iterations):
+        if cold:
+            clear_caches()
+        # Журнал запросов ограничен 9000 записей, после чего
+        # CaptureQueriesContext считает неверно
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started_at = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started_at) * 1000)
+        # Запросы DatabaseCache считаются отдельно от запросов к данным,
+        # BEGIN и COMMIT вокруг записей в кэш не считаются вовсе
+        statements = [
+            query['sql'] for query in captured
+            if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+        ]
+        cache_count = sum(
+            any(table in sql for table in CACHE_TABLES) for sql in statements
+        )
+        queries.append(len(statements) - cache_count)
+        cache_queries.append(cache_count)
+
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': statistics.median_low(queries),
+        'max_queries': max(queries),
+        'cache_queries': statistics.median_low(cache_queries),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_cases():
+    """Замеряемые вызовы: имя → (функция, зависит ли от кэша)"""
+    client = Client()
+    post_slug = Post.objects.popular().values_list('slug', flat=True).first()
+    tag_slug = Tag.objects.popular().values_list('slug', flat=True).first()
+    page_posts = list(
+        Post.objects.with_comments_count()
+        .with_prefetched_tags()
+        .select_related('author')
+        .order_by('-published_at', '-id')[:20]
+    )
+
+    def get(path):
+        def request():
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return request
+
+    return {
+        'queryset.post_popular': (lambda: list(Post.objects.popular()[:5]), False),
+        'queryset.tag_popular': (lambda: list(Tag.objects.popular()[:5]), False),
+        'queryset.with_comments_count': (
+            lambda: list(Post.objects.with_comments_count().order_by('-published_at', '-id')[:20]),
+            False,
+        ),
+        'queryset.with_prefetched_tags': (
+            lambda: list(Post.objects.with_prefetched_tags().order_by('-published_at', '-id')[:20]),
+            False,
+        ),
+        'serialize_post.x20': (lambda: [serialize_post(post) for post in page_posts], False),
+        'view.index': (get('/'), True),
+        'view.post_detail': (get(f'/post/{post_slug}'), True),
+        'view.tag_filter': (get(f'/tag/{tag_slug}/'), True),
+        'view.search': (get('/search/?q=django'), True),
+        'api.posts': (get('/api/posts/'), True),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы и страницы блога на синтетических данных во временной базе'
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--tags', type=int, default=defaults.tags)
+        parser.add_argument('--posts', type=int, default=defaults.posts)
+        parser.add_argument('--comments', type=int, default=defaults.comments)
+        parser.add_argument('--likes', type=int, default=defaults.likes)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--only', help='Замерять только вызовы, имя которых начинается с этой строки')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, users, tags, posts, comments, likes, seed, iterations, only, output,
+               **options):
+        size = DatasetSize(users=users, tags=tags, posts=posts, comments=comments, likes=likes)
+        # Данные создаются в тестовой базе, рабочая не затрагивается
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            started_at = time.monotonic()
+            generate_dataset(size, seed)
+            self.stderr.write(f'Данные созданы за {time.monotonic() - started_at:.1f} с')
+
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                results = {}
+                for name, (func, uses_cache) in get_cases().items():
+                    if only and not name.startswith(only):
+                        continue
+                    modes = ('cold', 'warm') if uses_cache else ('warm',)
+                    for mode in modes:
+                        result = measure(func, iterations, cold=mode == 'cold')
+                        results[f'{name}.{mode}'] = result
+                        self.stderr.write(
+                            f'{name}.{mode:<5} p50 {result["p50_ms"]:>8.2f} мс  '
+                            f'p95 {result["p95_ms"]:>8.2f} мс  p99 {result["p99_ms"]:>8.2f} мс  '
+                            f'запросов {result["queries"]} (+{result["cache_queries"]} к кэшу)'
+                        )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        report = json.dumps({
+            'commit': get_commit(),
+            'vendor': connection.vendor,
+            'dataset': {**size.__dict__, 'seed': seed},
+            'iterations': iterations,
+            'results': results,
+        }, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
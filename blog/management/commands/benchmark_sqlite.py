@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog.models import Post, Tag
+
+# Так ведёт себя база без настроек: журнал отката, полная синхронизация
+# и новое соединение на каждый запрос (CONN_MAX_AGE = 0)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+
+def get_read_queries():
+    """SQL самых частых чтений сайта: лента, популярные посты, страница тега"""
+    querysets = [
+        Post.objects.order_by('-published_at', '-id')[:21],
+        Post.objects.popular()[:5],
+        Tag.objects.popular()[:5],
+    ]
+    tag = Tag.objects.popular().first()
+    if tag:
+        querysets.append(Post.objects.filter(tags=tag).order_by('-published_at', '-id')[:21])
+    queries = []
+    for queryset in querysets:
+        sql, params = queryset.query.sql_with_params()
+        queries.append((sql.replace('%s', '?'), params))
+    return queries
+
+
+def connect(path, pragmas):
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+    for pragma, value in pragmas.items():
+        db.execute(f'PRAGMA {pragma} = {value}')
+    return db
+
+
+class Benchmark:
+    def __init__(self, path, queries, threads, duration, write_interval):
+        self.path = path
+        self.queries = queries
+        self.threads = threads
+        self.duration = duration
+        self.write_interval = write_interval
+
+    def run(self, pragmas, persistent):
+        # journal_mode=WAL сохраняется в файле базы, поэтому режим
+        # переключается явно перед каждым прогоном
+        connect(self.path, pragmas).close()
+        stop = threading.Event()
+        results = []
+        results_lock = threading.Lock()
+
+        def read():
+            reads, errors, latencies = 0, 0, []
+            db = connect(self.path, pragmas) if persistent else None
+            while not stop.is_set():
+                started_at = time.perf_counter()
+                try:
+                    current = db or connect(self.path, pragmas)
+                    for sql, params in self.queries:
+                        current.execute(sql, params).fetchall()
+                    if not persistent:
+                        current.close()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started_at)
+                reads += 1
+            if db:
+                db.close()
+            with results_lock:
+                results.append((reads, errors, latencies))
+
+        writes = [0]
+
+        def write():
+            db = connect(self.path, pragmas)
+            post_ids = [row[0] for row in db.execute('SELECT id FROM blog_post LIMIT 100')]
+            while not stop.is_set() and post_ids:
+                post_id = post_ids[writes[0] % len(post_ids)]
+                try:
+                    db.execute('BEGIN IMMEDIATE')
+                    db.execute(
+                        'UPDATE blog_post SET likes_count = likes_count WHERE id = ?', [post_id],
+                    )
+                    db.execute('COMMIT')
+                    writes[0] += 1
+                except sqlite3.OperationalError:
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                time.sleep(self.write_interval)
+            db.close()
+
+        workers = [threading.Thread(target=read) for _ in range(self.threads)]
+        if self.write_interval is not None:
+            workers.append(threading.Thread(target=write))
+        for worker in workers:
+            worker.start()
+        time.sleep(self.duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        reads = sum(result[0] for result in results)
+        errors = sum(result[1] for result in results)
+        latencies = sorted(latency for result in results for latency in result[2])
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        return {
+            'rps': reads / self.duration,
+            'p99_ms': p99,
+            'errors': errors,
+            'writes': writes[0],
+        }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость конкурентного чтения SQLite с настройками по умолчанию и SQLITE_PRODUCTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5, help='Длительность прогона в секундах')
+        parser.add_argument(
+            '--write-interval',
+            type=float,
+            default=0.01,
+            help='Пауза между записями фонового писателя в секундах',
+        )
+        parser.add_argument('--no-writer', action='store_true', help='Только чтения, без записи')
+
+    def handle(self, *args, threads, duration, write_interval, no_writer, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+
+        queries = get_read_queries()
+        # Замеры идут на копии, чтобы не переключать режим журнала рабочей базы
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            with sqlite3.connect(connection.settings_dict['NAME']) as source, sqlite3.connect(path) as target:
+                source.backup(target)
+            benchmark = Benchmark(path, queries, threads, duration, None if no_writer else write_interval)
+
+            modes = [
+                ('по умолчанию', DEFAULT_PRAGMAS, False),
+                ('SQLITE_PRODUCTION', settings.SQLITE_PRODUCTION_PRAGMAS, True),
+            ]
+            for title, pragmas, persistent in modes:
+                result = benchmark.run(pragmas, persistent)
+                self.stdout.write(
+                    f'{title}: {result["rps"]:.0f} запросов/с, p99 {result["p99_ms"]:.1f} мс, '
+                    f'ошибок {result["errors"]}, записей {result["writes"]}'
+                )
@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from blog.models import Comment, Post, Tag
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise CommandError(f'Некорректная дата: {value}')
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Выгружает теги, посты, комментарии и лайки в сжатые JSONL-файлы в формате import_blog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Папка для файлов *.jsonl.gz')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--since',
+            type=parse_moment,
+            help='Выгрузить только посты и комментарии, опубликованные начиная с этого момента (ISO 8601)',
+        )
+        parser.add_argument(
+            '--until',
+            type=parse_moment,
+            help='Выгрузить только посты и комментарии, опубликованные раньше этого момента (ISO 8601)',
+        )
+
+    def handle(self, *args, output_dir, chunk_size, since, until, **options):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+
+        published = {}
+        if since:
+            published['published_at__gte'] = since
+        if until:
+            published['published_at__lt'] = until
+        post_published = {f'post__{lookup}': value for lookup, value in published.items()}
+
+        # Файлы идут в порядке, в котором их надо загружать обратно:
+        # записи ссылаются только на объекты из предыдущих файлов
+        self.export(
+            'tags',
+            Tag.objects.values_list('title', 'slug'),
+            lambda title, slug: {'model': 'tag', 'title': title, 'slug': slug},
+        )
+        self.export(
+            'posts',
+            Post.objects.filter(**published).values_list(
+                'title', 'slug', 'text', 'image', 'published_at', 'author__username',
+            ),
+            lambda title, slug, text, image, published_at, author: {
+                'model': 'post',
+                'title': title,
+                'slug': slug,
+                'text': text,
+                'image': image,
+                'published_at': published_at.isoformat(),
+                'author': author,
+            },
+        )
+        self.export(
+            'post_tags',
+            Post.tags.through.objects.filter(**post_published)
+            .values_list('post__slug', 'tag__slug'),
+            lambda post, tag: {'model': 'post_tag', 'post': post, 'tag': tag},
+        )
+        self.export(
+            'likes',
+            Post.likes.through.objects.filter(**post_published)
+            .values_list('post__slug', 'user__username'),
+            lambda post, user: {'model': 'like', 'post': post, 'user': user},
+        )
+        self.export(
+            'comments',
+            Comment.objects.filter(**published).values_list(
+                'post__slug', 'author__username', 'text', 'published_at',
+            ),
+            lambda post, author, text, published_at: {
+                'model': 'comment',
+                'post': post,
+                'author': author,
+                'text': text,
+                'published_at': published_at.isoformat(),
+            },
+        )
+
+    def export(self, name, rows, to_record):
+        path = os.path.join(self.output_dir, f'{name}.jsonl.gz')
+        exported = 0
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            for row in rows.order_by('pk').iterator(chunk_size=self.chunk_size):
+                file.write(json.dumps(to_record(*row), ensure_ascii=False))
+                file.write('\n')
+                exported += 1
+        self.stdout.write(f'{path}: {exported} записей')
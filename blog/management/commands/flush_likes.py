@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.likes import flush_like_intents
+
+
+class Command(BaseCommand):
+    help = 'Переносит накопленные лайки и их отмены в Post.likes пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Повторять перенос каждые N секунд, пока команду не остановят',
+        )
+
+    def handle(self, *args, batch_size, interval, **options):
+        while True:
+            flushed = flush_like_intents(batch_size)
+            if flushed or not interval:
+                self.stdout.write(f'Применено лайков и отмен: {flushed}')
+            if not interval:
+                return
+            time.sleep(interval)
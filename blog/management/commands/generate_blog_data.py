@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from blog.synthetic import DatasetSize, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями, постами, тегами, лайками и комментариями'
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--tags', type=int, default=defaults.tags)
+        parser.add_argument('--posts', type=int, default=defaults.posts)
+        parser.add_argument('--comments', type=int, default=defaults.comments)
+        parser.add_argument('--likes', type=int, default=defaults.likes)
+        parser.add_argument('--max-tags-per-post', type=int, default=defaults.max_tags_per_post)
+        parser.add_argument(
+            '--post-skew', type=float, default=defaults.post_skew,
+            help='Показатель Ципфа для популярности постов, 0 — равномерно',
+        )
+        parser.add_argument('--tag-skew', type=float, default=defaults.tag_skew)
+        parser.add_argument('--user-skew', type=float, default=defaults.user_skew)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Число процессов для вставки пачек, имеет смысл для PostgreSQL',
+        )
+        parser.add_argument(
+            '--skip-finalize', action='store_true',
+            help='Не пересчитывать счётчики, рейтинг и поисковый индекс',
+        )
+
+    def handle(self, *args, seed, batch_size, processes, skip_finalize, **options):
+        size = DatasetSize(
+            users=options['users'],
+            tags=options['tags'],
+            posts=options['posts'],
+            comments=options['comments'],
+            likes=options['likes'],
+            max_tags_per_post=options['max_tags_per_post'],
+            post_skew=options['post_skew'],
+            tag_skew=options['tag_skew'],
+            user_skew=options['user_skew'],
+        )
+        if processes > 1 and connection.vendor == 'sqlite':
+            # SQLite допускает одного писателя, параллельные вставки упираются в блокировку
+            self.stderr.write('SQLite не поддерживает параллельную запись, используется один процесс')
+            processes = 1
+        started_at = time.monotonic()
+
+        def report(phase):
+            self.stdout.write(f'{phase}: {time.monotonic() - started_at:.1f} с')
+
+        generator = SyntheticDataGenerator(size, seed, batch_size, processes)
+        generator.generate(finalize=not skip_finalize, report=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.monotonic() - started_at:.1f} с'
+        ))
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from blog import cache
+from blog.models import Post
+from blog.renditions import generate_renditions, get_renditions
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Число процессов, по умолчанию по числу ядер')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии у всех постов')
+
+    def handle(self, *args, workers, batch_size, force, **options):
+        pending = [
+            (pk, image_name)
+            for pk, image_name, renditions in Post.objects.exclude(image='')
+            .values_list('pk', 'image', 'image_renditions')
+            .iterator()
+            if force or not get_renditions(image_name, renditions)
+        ]
+        # Дочерние процессы работают только с файлами, а открытые
+        # соединения с базой не должны попасть в них при форке
+        connections.close_all()
+
+        updated = []
+        failed = 0
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {
+                executor.submit(generate_renditions, image_name, force): (pk, image_name)
+                for pk, image_name in pending
+            }
+            for future in as_completed(futures):
+                pk, image_name = futures[future]
+                try:
+                    widths = future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{image_name}: {error}')
+                    continue
+                updated.append(Post(
+                    pk=pk,
+                    image_renditions={'source': image_name, 'widths': widths},
+                    updated_at=timezone.now(),
+                ))
+                if len(updated) >= batch_size:
+                    self.save(updated, batch_size)
+                    updated = []
+        self.save(updated, batch_size)
+
+        cache.bump_generation(cache.POSTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии созданы для {len(pending) - failed} постов, ошибок: {failed}'
+        ))
+
+    @staticmethod
+    def save(posts, batch_size):
+        Post.objects.bulk_update(posts, ['image_renditions', 'updated_at'], batch_size=batch_size)
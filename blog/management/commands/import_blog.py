@@ -0,0 +1,323 @@
+import contextlib
+import csv
+import gzip
+import json
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.counters import finalize_bulk_load
+from blog.models import Comment, Post, Tag
+
+MODELS = ('tag', 'post', 'comment', 'like', 'post_tag')
+REQUIRED_FIELDS = {
+    'tag': ('title', 'slug'),
+    'post': ('title', 'slug', 'author'),
+    'comment': ('post', 'author'),
+    'like': ('post', 'user'),
+    'post_tag': ('post', 'tag'),
+}
+LIST_SEPARATOR = ';'
+
+
+@contextlib.contextmanager
+def keep_published_at(*models):
+    """Даёт сохранить published_at из файла вместо текущего времени"""
+    fields = [model._meta.get_field('published_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def read_jsonl(source):
+    opener = gzip.open if source.endswith('.gz') else open
+    with opener(source, 'rt', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def read_csv(source, model):
+    with open(source, encoding='utf-8', newline='') as file:
+        for line_number, row in enumerate(csv.DictReader(file), start=1):
+            record = {key: value for key, value in row.items() if value != ''}
+            for key in ('tags', 'likes'):
+                if key in record:
+                    record[key] = record[key].split(LIST_SEPARATOR)
+            record['model'] = model
+            yield line_number, record
+
+
+def clean_record(record):
+    """Проверяет обязательные поля и разбирает published_at
+
+    Возвращает текст ошибки или None. Ошибка в середине пачки оставила бы
+    базу без части пачки, поэтому записи проверяются до загрузки.
+    """
+    model = record.get('model')
+    if model not in MODELS:
+        return f'неизвестный тип записи {model!r}'
+    missing = [field for field in REQUIRED_FIELDS[model] if not record.get(field)]
+    if missing:
+        return f'нет обязательных полей {", ".join(missing)}'
+    if 'published_at' in record:
+        try:
+            published_at = parse_datetime(record['published_at'])
+        except (TypeError, ValueError):
+            published_at = None
+        if published_at is None:
+            return f'некорректная дата published_at {record["published_at"]!r}'
+        if timezone.is_naive(published_at):
+            published_at = timezone.make_aware(published_at)
+        record['published_at'] = published_at
+    return None
+
+
+class SlugResolver:
+    """Соответствие slug → id в памяти, недостающие id добираются запросом"""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def load(self, values):
+        missing = set(values) - self.ids.keys()
+        if missing:
+            self.ids.update(
+                self.queryset.filter(**{f'{self.field}__in': missing})
+                .values_list(self.field, 'pk')
+            )
+
+    def __getitem__(self, value):
+        return self.ids[value]
+
+    def get(self, value):
+        return self.ids.get(value)
+
+
+class Importer:
+    def __init__(self, batch_size, resumed=False):
+        self.batch_size = batch_size
+        # Пачка могла быть зафиксирована, а файл состояния не записан.
+        # Связи и объекты со слагами повторно не вставятся из-за
+        # ignore_conflicts, а комментарии первой пачки сверяются с базой
+        self.dedupe_comments = resumed
+        self.users = SlugResolver(User.objects.all(), 'username')
+        self.tags = SlugResolver(Tag.objects.all(), 'slug')
+        self.posts = SlugResolver(Post.objects.all(), 'slug')
+        self.skipped = 0
+
+    def import_batch(self, records):
+        by_model = {model: [] for model in MODELS}
+        for record in records:
+            by_model[record['model']].append(record)
+
+        self.import_users(by_model)
+        self.import_tags(by_model['tag'])
+        self.import_posts(by_model['post'])
+        self.import_comments(by_model['comment'])
+        self.import_relations(by_model)
+
+    def import_users(self, by_model):
+        usernames = {record['author'] for model in ('post', 'comment') for record in by_model[model]}
+        usernames.update(record['user'] for record in by_model['like'])
+        usernames.update(
+            username for record in by_model['post'] for username in record.get('likes', [])
+        )
+        self.users.load(usernames)
+        missing = usernames - self.users.ids.keys()
+        if missing:
+            User.objects.bulk_create(
+                [User(username=username, password=make_password(None)) for username in missing],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            self.users.load(missing)
+
+    def import_tags(self, records):
+        Tag.objects.bulk_create(
+            [Tag(title=record['title'], slug=record['slug']) for record in records],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        self.tags.load(record['slug'] for record in records)
+
+    def import_posts(self, records):
+        now = timezone.now()
+        Post.objects.bulk_create(
+            [
+                Post(
+                    title=record['title'],
+                    slug=record['slug'],
+                    text=record.get('text', ''),
+                    image=record.get('image', ''),
+                    published_at=record.get('published_at', now),
+                    author_id=self.users[record['author']],
+                )
+                for record in records
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        self.posts.load(record['slug'] for record in records)
+
+    def import_comments(self, records):
+        self.posts.load(record['post'] for record in records)
+        now = timezone.now()
+        comments = []
+        for record in records:
+            post_id = self.posts.get(record['post'])
+            if post_id is None:
+                self.skipped += 1
+                continue
+            comment = Comment(
+                post_id=post_id,
+                author_id=self.users[record['author']],
+                text=record.get('text', ''),
+                published_at=record.get('published_at', now),
+            )
+            # Без даты в файле дата комментария при повторе будет другой
+            comment.natural_key = (post_id, comment.author_id, comment.text) \
+                + ((comment.published_at,) if 'published_at' in record else ())
+            comments.append(comment)
+
+        if self.dedupe_comments:
+            existing = self.find_existing_comments(comments)
+            comments = [comment for comment in comments if comment.natural_key not in existing]
+            self.dedupe_comments = False
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+    @staticmethod
+    def find_existing_comments(comments):
+        """Ключи уже загруженных комментариев: с датой и без неё"""
+        if not comments:
+            return set()
+        rows = Comment.objects.filter(
+            post_id__in={comment.post_id for comment in comments},
+            author_id__in={comment.author_id for comment in comments},
+        ).values_list('post_id', 'author_id', 'text', 'published_at')
+        existing = set()
+        for row in rows:
+            existing.add(row)
+            existing.add(row[:3])
+        return existing
+
+    def import_relations(self, by_model):
+        likes = [(record['post'], record['user']) for record in by_model['like']]
+        post_tags = [(record['post'], record['tag']) for record in by_model['post_tag']]
+        for record in by_model['post']:
+            likes.extend((record['slug'], username) for username in record.get('likes', []))
+            post_tags.extend((record['slug'], tag) for tag in record.get('tags', []))
+
+        self.posts.load(post for post, _ in likes + post_tags)
+        self.tags.load(tag for _, tag in post_tags)
+
+        self.bulk_create_links(Post.likes.through, 'user_id', likes, self.users)
+        self.bulk_create_links(Post.tags.through, 'tag_id', post_tags, self.tags)
+
+    def bulk_create_links(self, through, target_field, pairs, targets):
+        links = []
+        for post_slug, target in pairs:
+            post_id = self.posts.get(post_slug)
+            target_id = targets.get(target)
+            if post_id is None or target_id is None:
+                self.skipped += 1
+                continue
+            links.append(through(post_id=post_id, **{target_field: target_id}))
+        through.objects.bulk_create(links, batch_size=self.batch_size, ignore_conflicts=True)
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты, теги, комментарии и лайки из JSONL или CSV пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Путь к файлу .jsonl, .jsonl.gz или .csv')
+        parser.add_argument(
+            '--model',
+            choices=MODELS,
+            help='Тип записей в CSV-файле. В JSONL тип задаёт поле "model" каждой строки',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--state-file',
+            help='Файл с номером последней загруженной строки, чтобы продолжить прерванный импорт',
+        )
+        parser.add_argument(
+            '--skip-finalize',
+            action='store_true',
+            help='Не пересчитывать счётчики, рейтинг и поисковый индекс после загрузки',
+        )
+
+    def handle(self, *args, source, model, batch_size, state_file, skip_finalize, **options):
+        if source.endswith('.csv'):
+            if not model:
+                raise CommandError('Для CSV укажите --model')
+            records = read_csv(source, model)
+        else:
+            records = read_jsonl(source)
+
+        start_line = self.read_state(state_file, source)
+        importer = Importer(batch_size, resumed=start_line > 0)
+        started_at = time.monotonic()
+        imported = 0
+
+        with keep_published_at(Post, Comment):
+            batch = []
+            last_line = start_line
+            for line_number, record in records:
+                if line_number <= start_line:
+                    continue
+                error = clean_record(record)
+                if error:
+                    raise CommandError(f'Строка {line_number}: {error}')
+                batch.append(record)
+                last_line = line_number
+                if len(batch) >= batch_size:
+                    imported += self.flush(importer, batch, state_file, source, last_line)
+                    self.report(imported, started_at)
+                    batch = []
+            if batch:
+                imported += self.flush(importer, batch, state_file, source, last_line)
+                self.report(imported, started_at)
+
+        if importer.skipped:
+            self.stderr.write(f'Пропущено записей со ссылками на несуществующие объекты: {importer.skipped}')
+
+        if not skip_finalize:
+            finalize_bulk_load(batch_size, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f'Импортировано записей: {imported}'))
+
+    @staticmethod
+    def flush(importer, batch, state_file, source, last_line):
+        with transaction.atomic():
+            importer.import_batch(batch)
+        if state_file:
+            with open(state_file, 'w', encoding='utf-8') as file:
+                json.dump({'source': os.path.abspath(source), 'line': last_line}, file)
+        return len(batch)
+
+    @staticmethod
+    def read_state(state_file, source):
+        if not state_file or not os.path.exists(state_file):
+            return 0
+        with open(state_file, encoding='utf-8') as file:
+            state = json.load(file)
+        if state['source'] != os.path.abspath(source):
+            raise CommandError(f'Файл состояния {state_file} относится к {state["source"]}')
+        return state['line']
+
+    def report(self, imported, started_at):
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(f'Импортировано {imported} записей, {imported / elapsed:.0f} записей/с')
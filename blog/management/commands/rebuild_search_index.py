@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend('default')
+        if backend is None:
+            self.stderr.write('Полнотекстовый поиск не поддерживается этой СУБД')
+            return
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс перестроен'))
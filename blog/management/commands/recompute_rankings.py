@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog import cache
+from blog.ranking import recompute_hotness
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает «горячесть» постов для виджета популярных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        updated = recompute_hotness(batch_size)
+        cache.bump_generation(cache.RANKING)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано постов: {updated}'))
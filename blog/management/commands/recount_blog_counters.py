@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые счётчики лайков, комментариев и постов и TagPostIndex'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        posts_updated, tags_updated = recount_counters(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано постов: {posts_updated}, тегов: {tags_updated}'
+        ))
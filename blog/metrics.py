@@ -0,0 +1,241 @@
+"""
+Метрики запросов в формате Prometheus.
+
+MetricsMiddleware считает для каждого запроса число SQL-запросов, время в
+базе, попадания в кэш get_or_build, время рендера шаблона и общее время
+ответа, а затем складывает их в гистограммы процесса с меткой имени
+маршрута. Гистограммы отдаёт /metrics. Медленные запросы пишутся в лог
+вместе с самыми долгими SQL-запросами.
+
+Счётчики запроса лежат в contextvar, поэтому их видят и потоки, в которых
+асинхронные представления выполняют синхронный код.
+"""
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_RECORDED_QUERIES = 100
+SLOW_QUERIES_IN_LOG = 10
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Гистограммы и счётчики процесса"""
+
+    HISTOGRAMS = {
+        'blog_request_duration_seconds': ('Время ответа', DURATION_BUCKETS),
+        'blog_request_db_seconds': ('Время SQL-запросов за ответ', DURATION_BUCKETS),
+        'blog_request_render_seconds': ('Время рендера шаблона', DURATION_BUCKETS),
+        'blog_request_queries': ('Число SQL-запросов за ответ', QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._cache_lookups = {}
+
+    def observe(self, name, view, value):
+        with self._lock:
+            key = (name, view)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+            self._histograms[key].observe(value)
+
+    def count_cache_lookup(self, view, key, result):
+        with self._lock:
+            labels = (view, key, result)
+            self._cache_lookups[labels] = self._cache_lookups.get(labels, 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (histogram_name, view), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    # observe() уже считает бакеты накопительно, как требует формат
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.total}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+
+            lines.append('# HELP blog_cache_lookups_total Обращения к кэшу get_or_build')
+            lines.append('# TYPE blog_cache_lookups_total counter')
+            for (view, key, result), count in sorted(self._cache_lookups.items()):
+                lines.append(
+                    f'blog_cache_lookups_total{{view="{view}",key="{key}",result="{result}"}} {count}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0
+        self.render_time = 0
+        self.cache_lookups = []
+        self.sql = []
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper для всех соединений, см. blog.signals"""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started_at
+        with stats.lock:
+            stats.queries += 1
+            stats.db_time += duration
+            if len(stats.sql) < MAX_RECORDED_QUERIES:
+                stats.sql.append((duration, sql))
+
+
+def record_cache_lookup(name, result):
+    """Попадание (hit), промах (miss) или устаревшее значение (stale) в blog.cache"""
+    stats = _request_stats.get()
+    if stats is not None:
+        with stats.lock:
+            # Имена страниц ленты содержат курсор, в метку идёт только префикс
+            stats.cache_lookups.append((name.split(':')[0], result))
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        started_at = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats = _request_stats.get()
+            if stats is not None:
+                with stats.lock:
+                    stats.render_time += time.perf_counter() - started_at
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django с замером времени рендера страницы
+
+    Вложенные include рендерятся внутри движка и отдельно не считаются.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started_at = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.record(request, stats, time.perf_counter() - started_at)
+        return response
+
+    async def __acall__(self, request):
+        started_at = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.record(request, stats, time.perf_counter() - started_at)
+        return response
+
+    @staticmethod
+    def record(request, stats, duration):
+        match = request.resolver_match
+        # view_name с пространством имён: index админки не смешивается с лентой
+        view = match.view_name if match and match.url_name else 'unknown'
+        if view == 'metrics':
+            return
+
+        registry.observe('blog_request_duration_seconds', view, duration)
+        registry.observe('blog_request_db_seconds', view, stats.db_time)
+        registry.observe('blog_request_render_seconds', view, stats.render_time)
+        registry.observe('blog_request_queries', view, stats.queries)
+        for key, result in stats.cache_lookups:
+            registry.count_cache_lookup(view, key, result)
+
+        if duration >= settings.BLOG_SLOW_REQUEST_SECONDS:
+            slowest = sorted(stats.sql, reverse=True)[:SLOW_QUERIES_IN_LOG]
+            logger.warning(
+                'Медленный запрос %s (%s): %.3f с, SQL-запросов %s за %.3f с, рендер %.3f с\n%s',
+                request.get_full_path(),
+                view,
+                duration,
+                stats.queries,
+                stats.db_time,
+                stats.render_time,
+                '\n'.join(f'{query_duration:.4f} с: {sql}' for query_duration, sql in slowest),
+            )
+
+
+def metrics(request):
+    """Без BLOG_METRICS_TOKEN метрики отдаются только адресам из INTERNAL_IPS"""
+    token = settings.BLOG_METRICS_TOKEN
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
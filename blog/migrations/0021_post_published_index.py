@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_denormalized_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-published_at', '-id'], name='blog_post_published_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.15 on 2026-10-18 02:40
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5("
+    "title, text, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_post_fts (rowid, title, text) "
+    "SELECT id, title, text FROM blog_post",
+    "CREATE VIRTUAL TABLE blog_comment_fts USING fts5("
+    "text, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_comment_fts (rowid, text) "
+    "SELECT id, text FROM blog_comment",
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE blog_post_fts',
+    'DROP TABLE blog_comment_fts',
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX blog_post_search_idx ON blog_post USING GIN (("
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', \"text\"), 'B')))",
+    "CREATE INDEX blog_comment_search_idx ON blog_comment USING GIN ("
+    "to_tsvector('english', \"text\"))",
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX blog_post_search_idx',
+    'DROP INDEX blog_comment_search_idx',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_post_published_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': SQLITE_FORWARD,
+                'postgresql': POSTGRES_FORWARD,
+            }),
+            run_for_vendor({
+                'sqlite': SQLITE_BACKWARD,
+                'postgresql': POSTGRES_BACKWARD,
+            }),
+        ),
+    ]
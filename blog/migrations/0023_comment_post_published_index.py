@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0022_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'published_at', 'id'], name='blog_comment_post_pub_idx'),
+        ),
+    ]
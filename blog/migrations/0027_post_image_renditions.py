@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0026_like_intent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_renditions',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
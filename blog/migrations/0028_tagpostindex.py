@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def fill_tag_post_index(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    TagPostIndex = apps.get_model('blog', 'TagPostIndex')
+
+    links = Post.tags.through.objects.order_by() \
+        .values_list('tag_id', 'post_id', 'post__published_at', 'post__likes_count') \
+        .iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for tag_id, post_id, published_at, likes_count in links:
+        batch.append(TagPostIndex(
+            tag_id=tag_id, post_id=post_id, published_at=published_at, likes_count=likes_count,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            TagPostIndex.objects.bulk_create(batch)
+            batch = []
+    TagPostIndex.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0027_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagPostIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField()),
+                ('likes_count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_index', to='blog.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_index', to='blog.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-published_at', '-post'], name='blog_tagpost_recent_idx'), models.Index(fields=['tag', '-likes_count', '-post'], name='blog_tagpost_popular_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tag', 'post'), name='blog_tagpostindex_unique')],
+            },
+        ),
+        migrations.RunPython(fill_tag_post_index, migrations.RunPython.noop),
+    ]
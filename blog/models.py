@@ -1,40 +1,77 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Count, Prefetch
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(queryset, field):
+    """Коррелированный подзапрос с количеством строк на каждый объект"""
+    counts = queryset.filter(**{field: OuterRef('pk')}) \
+        .order_by() \
+        .values(field) \
+        .annotate(count=Count('*')) \
+        .values('count')
+    return Coalesce(Subquery(counts), Value(0))
 
 
 class TagQuerySet(models.QuerySet):
     def with_posts_count(self):
-        """Аннотация количества постов для тегов"""
-        return self.annotate(posts_count=Count('posts'))
+        """Количество постов хранится в поле posts_count, аннотация не нужна"""
+        return self.all()
 
     def popular(self):
         """Сортировка тегов по популярности"""
-        return self.with_posts_count().order_by('-posts_count')
+        return self.order_by('-posts_count')
+
+    def refresh_posts_count(self):
+        """Пересчёт сохранённого количества постов у тегов"""
+        return self.update(
+            posts_count=_count_subquery(Post.tags.through.objects, 'tag')
+        )
 
 
 class PostQuerySet(models.QuerySet):
     def popular(self):
-        """Сортировка постов по количеству лайков"""
-        return self.annotate(likes_count=Count('likes')).order_by('-likes_count')
+        """Сортировка постов по предрассчитанной «горячести»"""
+        return self.order_by('-hotness', '-id')
 
     def with_comments_count(self):
-        """Аннотация количества комментариев"""
-        return self.annotate(comments_count=Count('post_comments'))
+        """Количество комментариев хранится в поле comments_count"""
+        return self.all()
 
     def with_prefetched_tags(self):
-        """Префетч тегов с аннотацией количества постов"""
+        """Префетч тегов с количеством постов"""
         return self.prefetch_related(
             Prefetch('tags', queryset=Tag.objects.with_posts_count())
         )
 
+    def refresh_likes_count(self):
+        """Пересчёт сохранённого количества лайков у постов и в TagPostIndex"""
+        updated = self.update(
+            likes_count=_count_subquery(Post.likes.through.objects, 'post')
+        )
+        TagPostIndex.objects.filter(post__in=self.values('pk')).refresh_post_fields()
+        return updated
+
+    def refresh_comments_count(self):
+        """Пересчёт сохранённого количества комментариев у постов"""
+        return self.update(
+            comments_count=_count_subquery(Comment.objects, 'post')
+        )
+
 
 class Tag(models.Model):
     title = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     objects = TagQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-posts_count'], name='blog_tag_posts_count_idx'),
+        ]
+
 
 class Post(models.Model):
     title = models.CharField(max_length=200)
@@ -42,12 +79,24 @@ class Post(models.Model):
     slug = models.SlugField(unique=True)
     image = models.ImageField(upload_to='posts/')
     published_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     likes = models.ManyToManyField(User, related_name='liked_posts')
     tags = models.ManyToManyField(Tag, related_name='posts')
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    hotness = models.FloatField(default=0, editable=False)
+    image_renditions = models.JSONField(default=dict, editable=False)
 
     objects = PostQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes_count'], name='blog_post_likes_count_idx'),
+            models.Index(fields=['-published_at', '-id'], name='blog_post_published_idx'),
+            models.Index(fields=['-hotness', '-id'], name='blog_post_hotness_idx'),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_comments')
@@ -55,3 +104,81 @@ class Comment(models.Model):
     text = models.TextField()
     published_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'published_at', 'id'], name='blog_comment_post_pub_idx'),
+        ]
+
+
+class LikeIntent(models.Model):
+    """Лайк или его отмена, ещё не применённые к Post.likes
+
+    Запросы пользователей только дописываются в эту таблицу, а в Post.likes
+    их пачками переносит blog.likes.flush_like_intents.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='like_intents')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='like_intents')
+    liked = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TagPostIndexQuerySet(models.QuerySet):
+    def add_links(self, post_ids, tag_ids):
+        """Строки для всех пар из post_ids и tag_ids"""
+        posts = Post.objects.filter(pk__in=post_ids).values_list('pk', 'published_at', 'likes_count')
+        return self.bulk_create(
+            [
+                TagPostIndex(tag_id=tag_id, post_id=post_id, published_at=published_at,
+                             likes_count=likes_count)
+                for post_id, published_at, likes_count in posts
+                for tag_id in tag_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+    def remove_links(self, post_ids, tag_ids):
+        return self.filter(post_id__in=post_ids, tag_id__in=tag_ids).delete()
+
+    def rebuild_for_posts(self, post_ids):
+        """Заново строит строки постов по Post.tags, после вставок в обход сигналов"""
+        self.filter(post_id__in=post_ids).delete()
+        links = Post.tags.through.objects.filter(post_id__in=post_ids) \
+            .values_list('tag_id', 'post_id', 'post__published_at', 'post__likes_count')
+        return self.bulk_create([
+            TagPostIndex(tag_id=tag_id, post_id=post_id, published_at=published_at,
+                         likes_count=likes_count)
+            for tag_id, post_id, published_at, likes_count in links
+        ])
+
+    def refresh_post_fields(self):
+        """Копирует дату публикации и число лайков из постов"""
+        posts = Post.objects.filter(pk=OuterRef('post_id'))
+        return self.update(
+            published_at=Subquery(posts.values('published_at')[:1]),
+            likes_count=Subquery(posts.values('likes_count')[:1]),
+        )
+
+
+class TagPostIndex(models.Model):
+    """Посты каждого тега с ключами сортировки, копия Post.tags
+
+    Страница тега берёт из неё id постов по индексу (tag, published_at)
+    без соединения с таблицей постов и агрегатов. Строки добавляются и
+    удаляются вместе со связями Post.tags, а дата и лайки обновляются
+    вместе с постом, см. blog.signals.
+    """
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_index')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tag_index')
+    published_at = models.DateTimeField()
+    likes_count = models.PositiveIntegerField(default=0)
+
+    objects = TagPostIndexQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'], name='blog_tagpostindex_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-published_at', '-post'], name='blog_tagpost_recent_idx'),
+            models.Index(fields=['tag', '-likes_count', '-post'], name='blog_tagpost_popular_idx'),
+        ]
@@ -0,0 +1,126 @@
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+
+from django.db.models import Q
+
+NEXT = 'next'
+PREVIOUS = 'previous'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+
+def encode_cursor(values, direction=NEXT):
+    # isoformat() сохраняет микросекунды, которые DjangoJSONEncoder отбрасывает
+    values = [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    payload = json.dumps([direction, values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys):
+    """Разбирает курсор в направление и значения ключей сортировки"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return direction, [
+            model._meta.get_field(key).to_python(value)
+            for key, value in zip(keys, values)
+        ]
+    except Exception as error:
+        raise InvalidCursor(cursor) from error
+
+
+def is_forward_cursor(cursor):
+    """Ведёт ли курсор вглубь ленты, от новых записей к старым"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, _ = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as error:
+        raise InvalidCursor(cursor) from error
+    return direction == NEXT
+
+
+def get_cursor_values(item, keys):
+    if isinstance(item, dict):
+        return [item[key] for key in keys]
+    return [getattr(item, key) for key in keys]
+
+
+def _keyset_filter(keys, values, lookup):
+    """Условие «строка строго дальше курсора» для составного ключа
+
+    Для ключей (a, b) и lookup='lt' получается a < x OR (a = x AND b < y).
+    """
+    condition = Q()
+    for position, key in enumerate(keys):
+        equal = {k: v for k, v in zip(keys[:position], values[:position])}
+        condition |= Q(**equal, **{f'{key}__{lookup}': values[position]})
+    return condition
+
+
+def paginate(queryset, cursor=None, per_page=20, keys=('published_at', 'id'),
+             descending=True):
+    """Страница queryset, упорядоченного по keys, без OFFSET
+
+    Каждая следующая страница ищется условием по значениям ключей
+    последней строки предыдущей, поэтому глубокие страницы стоят столько же,
+    сколько первая, если по keys есть индекс.
+    """
+    keys = list(keys)
+    forward_order = [f'-{key}' for key in keys] if descending else keys
+    backward_order = keys if descending else [f'-{key}' for key in keys]
+    forward_lookup, backward_lookup = ('lt', 'gt') if descending else ('gt', 'lt')
+
+    if cursor is None:
+        items = list(queryset.order_by(*forward_order)[:per_page + 1])
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        return KeysetPage(
+            items=items,
+            next_cursor=encode_cursor(get_cursor_values(items[-1], keys)) if has_more else None,
+        )
+
+    direction, values = decode_cursor(cursor, queryset.model, keys)
+    if direction == NEXT:
+        items = list(
+            queryset.filter(_keyset_filter(keys, values, forward_lookup))
+            .order_by(*forward_order)[:per_page + 1]
+        )
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        has_previous = True
+    else:
+        items = list(
+            queryset.filter(_keyset_filter(keys, values, backward_lookup))
+            .order_by(*backward_order)[:per_page + 1]
+        )
+        has_previous = len(items) > per_page
+        items = items[:per_page][::-1]
+        has_more = True
+
+    if not items:
+        return KeysetPage(items=[])
+
+    return KeysetPage(
+        items=items,
+        next_cursor=encode_cursor(get_cursor_values(items[-1], keys)) if has_more else None,
+        previous_cursor=(
+            encode_cursor(get_cursor_values(items[0], keys), PREVIOUS)
+            if has_previous else None
+        ),
+    )
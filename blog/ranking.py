@@ -0,0 +1,37 @@
+from django.utils import timezone
+
+from blog.models import Post
+
+COMMENT_WEIGHT = 2
+AGE_OFFSET_HOURS = 2
+GRAVITY = 1.5
+
+
+def calculate_hotness(likes_count, comments_count, published_at, now):
+    """«Горячесть» поста: реакции, затухающие с возрастом поста"""
+    age_hours = max((now - published_at).total_seconds(), 0) / 3600
+    score = likes_count + COMMENT_WEIGHT * comments_count
+    return score / (age_hours + AGE_OFFSET_HOURS) ** GRAVITY
+
+
+def recompute_hotness(batch_size=1000, now=None):
+    """Пересчитывает Post.hotness пачками, возвращает число обновлённых постов"""
+    now = now or timezone.now()
+    rows = Post.objects.order_by() \
+        .values_list('pk', 'likes_count', 'comments_count', 'published_at') \
+        .iterator(chunk_size=batch_size)
+
+    batch = []
+    updated = 0
+    for pk, likes_count, comments_count, published_at in rows:
+        hotness = calculate_hotness(likes_count, comments_count, published_at, now)
+        batch.append(Post(pk=pk, hotness=hotness))
+        if len(batch) >= batch_size:
+            Post.objects.bulk_update(batch, ['hotness'])
+            updated += len(batch)
+            batch = []
+
+    if batch:
+        Post.objects.bulk_update(batch, ['hotness'])
+        updated += len(batch)
+    return updated
@@ -0,0 +1,97 @@
+"""
+Уменьшенные копии картинок постов для srcset.
+
+Для каждой картинки сохраняются WebP и JPEG нескольких ширин в
+MEDIA_ROOT/renditions/, рядом повторяя путь исходника. Какие ширины
+получились, записано в Post.image_renditions, поэтому сериализатору не
+нужно проверять файлы на диске.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from blog import cache
+from blog.models import Post
+from sensive_blog.db_router import pin_to_primary
+
+WIDTHS = (320, 640, 1024, 1600)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+RENDITIONS_DIR = 'renditions'
+
+
+def rendition_name(image_name, width, extension):
+    root, _ = os.path.splitext(image_name)
+    return f'{RENDITIONS_DIR}/{root}-{width}w.{extension}'
+
+
+def generate_renditions(image_name, overwrite=False):
+    """Создаёт недостающие копии и возвращает их ширины
+
+    Картинки не увеличиваются: если исходник уже самой маленькой ширины,
+    остаётся одна копия в его размере.
+    """
+    with default_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    widths = [width for width in WIDTHS if width < image.width] or [image.width]
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, options in FORMATS.items():
+            name = rendition_name(image_name, width, extension)
+            if default_storage.exists(name):
+                if not overwrite:
+                    continue
+                default_storage.delete(name)
+            converted = resized
+            if extension == 'jpeg' and resized.mode != 'RGB':
+                converted = resized.convert('RGB')
+            buffer = io.BytesIO()
+            converted.save(buffer, **options)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return widths
+
+
+def get_renditions(image_name, renditions):
+    """Ширины копий, если они сделаны для текущего файла картинки"""
+    if not image_name or renditions.get('source') != image_name:
+        return []
+    return renditions['widths']
+
+
+def build_srcset(image_name, widths, extension):
+    return ', '.join(
+        f'{default_storage.url(rendition_name(image_name, width, extension))} {width}w'
+        for width in widths
+    )
+
+
+def update_post_renditions(post_id):
+    """Задача очереди: копии картинки поста после загрузки
+
+    Поста может ещё не быть на реплике, поэтому чтение идёт из основной
+    базы. Если поста нет и там, задача падает и очередь её повторит, как и
+    когда файла картинки ещё нет в хранилище.
+    """
+    pin_to_primary()
+    image_name = Post.objects.values_list('image', flat=True).get(pk=post_id)
+    # Картинку уже убрали из поста
+    if not image_name:
+        return
+    widths = generate_renditions(image_name)
+    # Картинку могли заменить, пока делались копии
+    Post.objects.filter(pk=post_id, image=image_name).update(
+        image_renditions={'source': image_name, 'widths': widths},
+        updated_at=timezone.now(),
+    )
+    cache.bump_generation(cache.POSTS)
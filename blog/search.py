@@ -0,0 +1,166 @@
+import re
+
+from django.db import connections, router
+
+from blog.models import Comment, Post
+
+SEARCH_CONFIG = 'english'
+MAX_RESULTS = 1000
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query)
+
+
+class SqliteSearchBackend:
+    """Поиск по виртуальным таблицам FTS5
+
+    Таблицы blog_post_fts и blog_comment_fts создаёт миграция, rowid строки
+    совпадает с id поста или комментария. Индекс обновляют сигналы.
+    """
+
+    def __init__(self, using):
+        self.using = using
+
+    @staticmethod
+    def _match_expression(query):
+        # Каждое слово берётся в кавычки, чтобы пользовательский ввод
+        # не разбирался как синтаксис FTS5, и ищется по префиксу
+        return ' '.join(f'"{token}"*' for token in _tokens(query))
+
+    def _search(self, sql, query, limit):
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, [expression, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_posts(self, query, limit=MAX_RESULTS):
+        return self._search(
+            'SELECT rowid FROM blog_post_fts WHERE blog_post_fts MATCH %s '
+            'ORDER BY bm25(blog_post_fts, 10.0, 1.0) LIMIT %s',
+            query,
+            limit,
+        )
+
+    def search_comments(self, query, limit=MAX_RESULTS):
+        return self._search(
+            'SELECT rowid FROM blog_comment_fts WHERE blog_comment_fts MATCH %s '
+            'ORDER BY bm25(blog_comment_fts) LIMIT %s',
+            query,
+            limit,
+        )
+
+    def index_post(self, post):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('DELETE FROM blog_post_fts WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                'INSERT INTO blog_post_fts (rowid, title, text) VALUES (%s, %s, %s)',
+                [post.pk, post.title, post.text],
+            )
+
+    def remove_post(self, post_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('DELETE FROM blog_post_fts WHERE rowid = %s', [post_id])
+
+    def index_comment(self, comment):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('DELETE FROM blog_comment_fts WHERE rowid = %s', [comment.pk])
+            cursor.execute(
+                'INSERT INTO blog_comment_fts (rowid, text) VALUES (%s, %s)',
+                [comment.pk, comment.text],
+            )
+
+    def remove_comment(self, comment_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('DELETE FROM blog_comment_fts WHERE rowid = %s', [comment_id])
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('DELETE FROM blog_post_fts')
+            cursor.execute(
+                'INSERT INTO blog_post_fts (rowid, title, text) '
+                'SELECT id, title, text FROM blog_post'
+            )
+            cursor.execute('DELETE FROM blog_comment_fts')
+            cursor.execute(
+                'INSERT INTO blog_comment_fts (rowid, text) '
+                'SELECT id, text FROM blog_comment'
+            )
+
+
+class PostgresSearchBackend:
+    """Поиск по tsvector с GIN-индексами по выражениям
+
+    Индексы строит миграция, а обновляет сам PostgreSQL, поэтому методы
+    индексации ничего не делают. Выражения в запросах должны совпадать
+    с выражениями индексов, иначе индекс не будет использован.
+    """
+
+    POST_VECTOR = (
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', \"text\"), 'B')"
+    )
+    COMMENT_VECTOR = f"to_tsvector('{SEARCH_CONFIG}', \"text\")"
+    QUERY = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+
+    def __init__(self, using):
+        self.using = using
+
+    def _search(self, table, vector, query, limit):
+        if not _tokens(query):
+            return []
+        sql = (
+            f'SELECT id FROM {table} WHERE {vector} @@ {self.QUERY} '
+            f'ORDER BY ts_rank({vector}, {self.QUERY}) DESC LIMIT %s'
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, [query, query, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_posts(self, query, limit=MAX_RESULTS):
+        return self._search('blog_post', self.POST_VECTOR, query, limit)
+
+    def search_comments(self, query, limit=MAX_RESULTS):
+        return self._search('blog_comment', self.COMMENT_VECTOR, query, limit)
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using=None, model=Post):
+    """Бэкенд полнотекстового поиска для базы или None, если её СУБД не поддерживается"""
+    using = using or router.db_for_read(model)
+    backend_class = BACKENDS.get(connections[using].vendor)
+    return backend_class(using) if backend_class else None
+
+
+def search_posts(query, limit=MAX_RESULTS):
+    """Id постов, подходящих под запрос, от самого релевантного"""
+    backend = get_search_backend(model=Post)
+    return backend.search_posts(query, limit) if backend else None
+
+
+def search_comments(query, limit=MAX_RESULTS):
+    """Id комментариев, подходящих под запрос, от самого релевантного"""
+    backend = get_search_backend(model=Comment)
+    return backend.search_comments(query, limit) if backend else None
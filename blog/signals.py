@@ -0,0 +1,211 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from blog import cache
+from blog.metrics import record_query
+from blog.models import Comment, Post, Tag, TagPostIndex
+from blog.renditions import get_renditions, update_post_renditions
+from blog.search import get_search_backend
+from blog.slugs import forget_slugs
+from blog.tasks import enqueue_on_commit
+
+
+def _affected_ids(instance, reverse, pk_set):
+    """Id постов или тегов, чьи счётчики затронуло изменение связи"""
+    if reverse:
+        return pk_set or set()
+    return {instance.pk}
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def update_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_post_ids = set(
+            instance.liked_posts.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear' and reverse:
+        post_ids = instance.__dict__.pop('_cleared_post_ids', set())
+    else:
+        post_ids = _affected_ids(instance, reverse, pk_set)
+    Post.objects.filter(pk__in=post_ids).refresh_likes_count()
+    cache.bump_generation_on_commit(cache.LIKES)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_posts_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_tag_ids = set(
+            instance.tags.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear' and not reverse:
+        tag_ids = instance.__dict__.pop('_cleared_tag_ids', set())
+    elif reverse:
+        tag_ids = {instance.pk}
+    else:
+        tag_ids = pk_set or set()
+
+    if action == 'post_clear':
+        TagPostIndex.objects.filter(**{'tag' if reverse else 'post': instance}).delete()
+    else:
+        post_ids = pk_set if reverse else {instance.pk}
+        if action == 'post_add':
+            TagPostIndex.objects.add_links(post_ids or set(), tag_ids)
+        else:
+            TagPostIndex.objects.remove_links(post_ids or set(), tag_ids)
+
+    Tag.objects.filter(pk__in=tag_ids).refresh_posts_count()
+    cache.bump_generation_on_commit(cache.TAGS)
+
+
+def _deleted_with_post(origin):
+    """Удаление началось с поста или выборки постов"""
+    return isinstance(origin, Post) or getattr(origin, 'model', None) is Post
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def update_comments_count(sender, instance, **kwargs):
+    if kwargs.get('raw') or getattr(instance, 'deferred_processing', False):
+        return
+    # Комментарии удаляются каскадом вместе с постом: счётчик строки,
+    # которая сейчас исчезнет, пересчитывать незачем, кэш сбросит пост
+    if _deleted_with_post(kwargs.get('origin')):
+        return
+    Post.objects.filter(pk=instance.post_id).refresh_comments_count()
+    cache.bump_generation_on_commit(cache.COMMENTS)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_posts(sender, instance, created, **kwargs):
+    cache.bump_generation_on_commit(cache.FEED if created else cache.POSTS)
+
+
+@receiver(post_save, sender=Post)
+def update_tag_post_index(sender, instance, created, raw=False, **kwargs):
+    # У нового поста ещё нет тегов, а значит и строк в индексе
+    if raw or created:
+        return
+    TagPostIndex.objects.filter(post=instance).update(
+        published_at=instance.published_at,
+        likes_count=instance.likes_count,
+    )
+
+
+@receiver(post_save, sender=Post)
+def make_image_renditions(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if not get_renditions(instance.image.name, instance.image_renditions):
+        enqueue_on_commit(update_post_renditions, instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, instance, **kwargs):
+    cache.bump_generation_on_commit(cache.TAGS)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._deleted_tag_ids = set(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def update_tags_after_post_delete(sender, instance, **kwargs):
+    tag_ids = instance.__dict__.pop('_deleted_tag_ids', set())
+    Tag.objects.filter(pk__in=tag_ids).refresh_posts_count()
+    cache.bump_generation_on_commit(cache.POSTS, cache.FEED, cache.TAGS, cache.COMMENTS)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Tag)
+def remember_old_slug(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._old_slug = sender.objects.filter(pk=instance.pk) \
+        .values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Tag)
+def invalidate_slugs(sender, instance, using, **kwargs):
+    # Старый слаг, если его сменили, и новый, под которым мог лежать
+    # отрицательный ответ. После фиксации, чтобы параллельный запрос не
+    # вернул в кэш данные из ещё не зафиксированной транзакции
+    slugs = {instance.slug, instance.__dict__.pop('_old_slug', None)} - {None}
+    transaction.on_commit(lambda: forget_slugs(sender, slugs), using=using)
+
+
+@receiver(pre_delete, sender=User)
+def remember_liked_posts(sender, instance, **kwargs):
+    instance._liked_post_ids = set(
+        instance.liked_posts.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def update_likes_after_user_delete(sender, instance, **kwargs):
+    post_ids = instance.__dict__.pop('_liked_post_ids', set())
+    Post.objects.filter(pk__in=post_ids).refresh_likes_count()
+    cache.bump_generation_on_commit(cache.LIKES)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend:
+        backend.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend:
+        backend.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, using, **kwargs):
+    # Новый комментарий с сайта индексирует blog.comments.process_comment
+    if getattr(instance, 'deferred_processing', False):
+        return
+    backend = get_search_backend(using)
+    if backend:
+        backend.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend:
+        backend.remove_comment(instance.pk)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Сигнал приходит при каждом переподключении того же объекта соединения
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,54 @@
+"""
+Кэш слагов постов и тегов.
+
+Слаг из URL превращается в id, заголовок и слаг без запроса к базе: запись
+лежит в L1 процесса и в общем кэше, алиас CACHES 'slugs' со своим размером
+LRU. Несуществующие слаги тоже кэшируются, но ненадолго, чтобы боты,
+перебирающие адреса, не доходили до базы. Записи удаляются сигналами после
+сохранения и удаления постов и тегов, см. blog.signals.
+"""
+from django.core.cache import caches
+
+from blog.metrics import record_cache_lookup
+from blog.models import Post, Tag
+
+KEY = 'blog:slug:{}:{}'
+TIMEOUT = 60 * 60 * 24
+MISSING_TIMEOUT = 60
+# Отрицательная запись: None кэш вернул бы и при промахе
+MISSING = False
+
+KINDS = {Post: 'post', Tag: 'tag'}
+FIELDS = ('id', 'slug', 'title')
+
+
+def _get_by_slug(model, slug):
+    kind = KINDS[model]
+    slug_cache = caches['slugs']
+    key = KEY.format(kind, slug)
+    row = slug_cache.get(key)
+    if row is not None:
+        record_cache_lookup(f'slug_{kind}', 'hit')
+        return row or None
+
+    record_cache_lookup(f'slug_{kind}', 'miss')
+    row = model.objects.filter(slug=slug).values(*FIELDS).first()
+    if row is None:
+        slug_cache.set(key, MISSING, MISSING_TIMEOUT)
+    else:
+        slug_cache.set(key, row, TIMEOUT)
+    return row
+
+
+def get_post_by_slug(slug):
+    """id, slug и title поста или None"""
+    return _get_by_slug(Post, slug)
+
+
+def get_tag_by_slug(slug):
+    """id, slug и title тега или None"""
+    return _get_by_slug(Tag, slug)
+
+
+def forget_slugs(model, slugs):
+    caches['slugs'].delete_many([KEY.format(KINDS[model], slug) for slug in slugs])
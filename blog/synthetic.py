@@ -0,0 +1,254 @@
+"""
+Синтетические данные блога для бенчмарков и нагрузочных тестов.
+
+Популярность постов, тегов и активность пользователей распределены по
+закону Ципфа: объект с рангом r выбирается с весом 1 / r ** skew, поэтому
+несколько постов собирают основную часть лайков и комментариев, а
+несколько тегов стоят почти на каждом посте. skew = 0 даёт равномерное
+распределение.
+
+Всё создаётся через bulk_create пачками, включая промежуточные таблицы
+лайков и тегов, а счётчики, рейтинг и поисковый индекс пересчитываются в
+конце одним проходом, как после импорта. Каждая пачка получает свой
+генератор случайных чисел из seed, фазы и номера пачки, поэтому данные
+одинаковы при одинаковом seed независимо от числа процессов.
+"""
+import datetime
+import itertools
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections
+from django.utils import timezone
+
+from blog.counters import finalize_bulk_load
+from blog.management.commands.import_blog import keep_published_at
+from blog.models import Comment, Post, Tag
+
+WORDS = (
+    'python django sqlite postgres cache index query view template tag post '
+    'comment like feed cursor page search rank speed travel food photo city '
+    'mountain river forest morning evening coffee book music film garden'
+).split()
+PERIOD = datetime.timedelta(days=365)
+USERNAME_PREFIX = 'synthetic'
+POST_SLUG_PREFIX = 'synthetic-post-'
+TAG_SLUG_PREFIX = 'tag-'
+
+# Состояние генератора для дочерних процессов: они наследуют его при fork
+_generator = None
+
+
+@dataclass
+class DatasetSize:
+    users: int = 200
+    tags: int = 50
+    posts: int = 2000
+    comments: int = 10000
+    likes: int = 20000
+    max_tags_per_post: int = 5
+    post_skew: float = 1.1
+    tag_skew: float = 1.0
+    user_skew: float = 0.8
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+class ZipfSampler:
+    """Выбор из items с весом 1 / rank ** skew
+
+    Ранги раздаются в случайном порядке, чтобы популярными оказались не
+    обязательно первые созданные объекты.
+    """
+
+    def __init__(self, items, skew, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)
+        ))
+
+    def sample(self, rng, count):
+        return rng.choices(self.items, cum_weights=self.cum_weights, k=count)
+
+    def sample_distinct(self, rng, count):
+        """До count разных объектов, для тегов одного поста"""
+        count = min(count, len(self.items))
+        picked = set()
+        for _ in range(count * 10):
+            picked.add(self.sample(rng, 1)[0])
+            if len(picked) == count:
+                break
+        return list(picked)
+
+
+def iter_chunks(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield start, min(chunk_size, total - start)
+
+
+def _run_chunk(phase, number, start, count):
+    return getattr(_generator, f'create_{phase}')(number, start, count)
+
+
+class SyntheticDataGenerator:
+    def __init__(self, size, seed=0, batch_size=5000, processes=1):
+        self.size = size
+        self.seed = seed
+        self.batch_size = batch_size
+        self.processes = processes
+        self.now = timezone.now()
+        self.password = make_password(None)
+        self.users = None
+        self.tags = None
+        self.posts = None
+        self.post_ids = []
+
+    def chunk_rng(self, phase, number):
+        return random.Random(f'{self.seed}:{phase}:{number}')
+
+    def run_phase(self, phase, total):
+        """Выполняет create_<phase> пачками, в нескольких процессах если нужно"""
+        chunks = [
+            (phase, number, start, count)
+            for number, (start, count) in enumerate(iter_chunks(total, self.batch_size))
+        ]
+        if self.processes <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                getattr(self, f'create_{phase}')(*chunk[1:])
+            return
+
+        global _generator
+        _generator = self
+        # Дочерние процессы не должны унаследовать открытые соединения
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(self.processes, mp_context=context) as executor:
+            for _ in executor.map(_run_chunk, *zip(*chunks)):
+                pass
+
+    def create_users(self, number, start, count):
+        User.objects.bulk_create(
+            [
+                User(username=f'{USERNAME_PREFIX}{index}', password=self.password)
+                for index in range(start, start + count)
+            ],
+            ignore_conflicts=True,
+        )
+
+    def create_posts(self, number, start, count):
+        rng = self.chunk_rng('posts', number)
+        authors = self.users.sample(rng, count)
+        with keep_published_at(Post):
+            Post.objects.bulk_create(
+                [
+                    Post(
+                        title=random_text(rng, 6),
+                        slug=f'{POST_SLUG_PREFIX}{index}',
+                        text=random_text(rng, 150),
+                        author_id=author_id,
+                        published_at=self.now - PERIOD * rng.random(),
+                    )
+                    for index, author_id in zip(range(start, start + count), authors)
+                ],
+                ignore_conflicts=True,
+            )
+
+    def create_post_tags(self, number, start, count):
+        rng = self.chunk_rng('post_tags', number)
+        through = Post.tags.through
+        post_ids = self.post_ids[start:start + count]
+        through.objects.bulk_create(
+            [
+                through(post_id=post_id, tag_id=tag_id)
+                for post_id in post_ids
+                for tag_id in self.tags.sample_distinct(
+                    rng, rng.randint(1, self.size.max_tags_per_post),
+                )
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def create_likes(self, number, start, count):
+        rng = self.chunk_rng('likes', number)
+        through = Post.likes.through
+        # Повторы внутри пачки отбрасываются здесь, между пачками — базой
+        pairs = set(zip(self.posts.sample(rng, count), self.users.sample(rng, count)))
+        through.objects.bulk_create(
+            [through(post_id=post_id, user_id=user_id) for post_id, user_id in pairs],
+            ignore_conflicts=True,
+        )
+
+    def create_comments(self, number, start, count):
+        rng = self.chunk_rng('comments', number)
+        posts = self.posts.sample(rng, count)
+        authors = self.users.sample(rng, count)
+        with keep_published_at(Comment):
+            Comment.objects.bulk_create([
+                Comment(
+                    post_id=post_id,
+                    author_id=author_id,
+                    text=random_text(rng, rng.randint(5, 40)),
+                    published_at=self.now - PERIOD * rng.random(),
+                )
+                for post_id, author_id in zip(posts, authors)
+            ])
+
+    def create_tags(self):
+        rng = self.chunk_rng('tags', 0)
+        Tag.objects.bulk_create(
+            [
+                Tag(title=f'{rng.choice(WORDS)}-{index}', slug=f'{TAG_SLUG_PREFIX}{index}')
+                for index in range(self.size.tags)
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def load_ids(self, queryset, field, prefix):
+        # Порядок по имени, а не по pk: при нескольких процессах pk раздаются
+        # в разном порядке, а выборка должна зависеть только от seed
+        return list(
+            queryset.filter(**{f'{field}__startswith': prefix})
+            .order_by(field)
+            .values_list('pk', flat=True)
+        )
+
+    def generate(self, finalize=True, report=None):
+        report = report or (lambda phase: None)
+
+        self.run_phase('users', self.size.users)
+        report('users')
+        self.create_tags()
+        user_ids = self.load_ids(User.objects.all(), 'username', USERNAME_PREFIX)
+        tag_ids = self.load_ids(Tag.objects.all(), 'slug', TAG_SLUG_PREFIX)
+        self.users = ZipfSampler(user_ids, self.size.user_skew, self.chunk_rng('users', 'rank'))
+        self.tags = ZipfSampler(tag_ids, self.size.tag_skew, self.chunk_rng('tags', 'rank'))
+        report('tags')
+
+        self.run_phase('posts', self.size.posts)
+        self.post_ids = self.load_ids(Post.objects.all(), 'slug', POST_SLUG_PREFIX)
+        self.posts = ZipfSampler(self.post_ids, self.size.post_skew, self.chunk_rng('posts', 'rank'))
+        report('posts')
+
+        self.run_phase('post_tags', len(self.post_ids))
+        report('post_tags')
+        self.run_phase('likes', self.size.likes)
+        report('likes')
+        self.run_phase('comments', self.size.comments)
+        report('comments')
+
+        if finalize:
+            finalize_bulk_load(self.batch_size)
+            report('finalize')
+
+
+def generate_dataset(size, seed=0, batch_size=5000, processes=1):
+    SyntheticDataGenerator(size, seed, batch_size, processes).generate()
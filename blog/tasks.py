@@ -0,0 +1,98 @@
+"""
+Очередь фоновых задач внутри процесса.
+
+Задачи выполняет пул потоков. Упавшая задача повторяется с
+экспоненциальной паузой. Если очередь заполнена, задача выполняется
+прямо в вызывающем потоке: запрос становится медленнее, но работа не
+теряется, а очередь не растёт без предела.
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_task_queue = None
+_task_queue_lock = threading.Lock()
+
+
+class TaskQueue:
+    def __init__(self, workers, max_size, max_retries, retry_delay):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(max_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # Потоки запускаются при первой задаче, уже после форка воркеров сервера
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'blog-tasks-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        self._enqueue((func, args, kwargs, 0))
+
+    def _enqueue(self, task):
+        if self.workers:
+            self._start()
+            try:
+                self._queue.put_nowait(task)
+                return
+            except queue.Full:
+                logger.warning('Очередь задач заполнена, %s выполняется в вызывающем потоке', task[0].__name__)
+        self._run(task)
+
+    def _run(self, task):
+        func, args, kwargs, attempt = task
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            if attempt >= self.max_retries:
+                logger.exception('Задача %s не выполнена за %s попыток', func.__name__, attempt + 1)
+                return
+            delay = self.retry_delay * 2 ** attempt
+            logger.warning('Задача %s упала, повтор через %s с', func.__name__, delay, exc_info=True)
+            timer = threading.Timer(delay, self._enqueue, [(func, args, kwargs, attempt + 1)])
+            timer.daemon = True
+            timer.start()
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            close_old_connections()
+            try:
+                self._run(task)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def join(self):
+        """Ждёт, пока очередь опустеет"""
+        self._queue.join()
+
+
+def get_task_queue():
+    global _task_queue
+    with _task_queue_lock:
+        if _task_queue is None:
+            _task_queue = TaskQueue(
+                workers=settings.BLOG_TASK_WORKERS,
+                max_size=settings.BLOG_TASK_QUEUE_SIZE,
+                max_retries=settings.BLOG_TASK_MAX_RETRIES,
+                retry_delay=settings.BLOG_TASK_RETRY_DELAY,
+            )
+        return _task_queue
+
+
+def enqueue_on_commit(func, *args, **kwargs):
+    """Ставит задачу в очередь после фиксации текущей транзакции"""
+    transaction.on_commit(lambda: get_task_queue().submit(func, *args, **kwargs))
@@ -0,0 +1,12 @@
+import hashlib
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def fragment_version(items):
+    """Версия фрагмента со списком объектов: меняется, если поменялся любой из них"""
+    versions = '|'.join(str(item['cache_version']) for item in items)
+    return hashlib.md5(versions.encode()).hexdigest()
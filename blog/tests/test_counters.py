@@ -0,0 +1,53 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from blog import cache
+from blog.counters import COUNTER_NAMESPACES
+from blog.models import Comment, Post, Tag
+from blog.tests.test_query_counts import CACHES, clear_caches
+
+
+@override_settings(CACHES=CACHES)
+class CountersTest(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.author = User.objects.create(username='author')
+        self.tag = Tag.objects.create(title='Python', slug='python')
+        self.post = Post.objects.create(title='Пост', slug='post', text='Текст', author=self.author)
+        self.post.tags.add(self.tag)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=f'Комментарий {number}')
+            for number in range(5)
+        )
+
+    def test_recount_fixes_counters_and_bumps_cache(self):
+        Post.objects.update(comments_count=0)
+        Tag.objects.update(posts_count=0)
+        generations = cache.get_generations(COUNTER_NAMESPACES)
+
+        call_command('recount_blog_counters', stdout=io.StringIO())
+
+        self.post.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        self.assertEqual(self.tag.posts_count, 1)
+        new_generations = cache.get_generations(COUNTER_NAMESPACES)
+        for namespace in COUNTER_NAMESPACES:
+            self.assertNotEqual(new_generations[namespace], generations[namespace], namespace)
+
+    def test_post_delete_does_not_recount_its_comments(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        post_updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "blog_post"')]
+        self.assertEqual(post_updates, [])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_delete_recounts_its_post(self):
+        Comment.objects.first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 4)
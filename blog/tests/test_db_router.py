@@ -0,0 +1,171 @@
+"""
+Маршрутизация чтений на реплики и закрепление за основной базой.
+
+Репликами служат отдельные файлы SQLite с таблицей тегов, в каждой лежит
+тег с именем реплики, поэтому по результату запроса видно, куда он ушёл.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from blog.models import Post, Tag
+from sensive_blog import db_router
+from sensive_blog.db_router import PIN_COOKIE_NAME, ReplicaPinningMiddleware
+
+REPLICAS = ['replica_1', 'replica_2']
+UNREACHABLE_REPLICA = 'replica_down'
+ROUTERS = ['sensive_blog.db_router.PrimaryReplicaRouter']
+
+
+class ReplicaTestMixin:
+    # Реплики добавляются в setUpClass, а '__all__' раскрывается после этого
+    databases = '__all__'
+    replicas = REPLICAS
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        for alias in REPLICAS:
+            cls.add_replica(alias, cls.create_replica_file(directory.name, alias))
+        # Каталога нет, SQLite не сможет открыть файл
+        cls.add_replica(UNREACHABLE_REPLICA, os.path.join(directory.name, 'missing', 'db.sqlite3'))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in [*REPLICAS, UNREACHABLE_REPLICA]:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        super().tearDownClass()
+
+    def setUp(self):
+        # Запись в других тестах могла закрепить текущий контекст за основной базой
+        for variable in (db_router._pinned_to_primary, db_router._wrote_to_primary):
+            self.addCleanup(variable.reset, variable.set(False))
+
+        replicas_settings = override_settings(DATABASE_REPLICAS=self.replicas, DATABASE_ROUTERS=ROUTERS)
+        replicas_settings.enable()
+        self.addCleanup(replicas_settings.disable)
+
+    @staticmethod
+    def create_replica_file(directory, alias):
+        path = os.path.join(directory, f'{alias}.sqlite3')
+        with sqlite3.connect(path) as replica:
+            replica.execute(
+                'CREATE TABLE blog_tag (id integer PRIMARY KEY, title text, slug text, posts_count integer)'
+            )
+            replica.execute('INSERT INTO blog_tag VALUES (1, ?, ?, 0)', (alias, alias))
+        replica.close()
+        return path
+
+    @staticmethod
+    def add_replica(alias, path):
+        connections.settings[alias] = {**connections.settings[DEFAULT_DB_ALIAS], 'NAME': path}
+
+    @staticmethod
+    def read_from():
+        """Имя реплики, с которой прочитан тег, или None для основной базы"""
+        tag = Tag.objects.filter(slug__in=REPLICAS).first()
+        return tag.slug if tag else None
+
+
+class PrimaryReplicaRouterTest(ReplicaTestMixin, SimpleTestCase):
+    def test_reads_go_to_replicas_in_turn(self):
+        self.assertEqual(
+            [router.db_for_read(Post) for _ in range(4)],
+            ['replica_1', 'replica_2', 'replica_1', 'replica_2'],
+        )
+        self.assertEqual([self.read_from() for _ in range(2)], REPLICAS)
+
+    def test_writes_go_to_default(self):
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_write(Tag), DEFAULT_DB_ALIAS)
+
+    def test_reads_are_pinned_to_default_after_write(self):
+        self.assertEqual(router.db_for_read(Post), 'replica_1')
+        router.db_for_write(Post)
+        self.assertEqual([router.db_for_read(Post) for _ in range(3)], [DEFAULT_DB_ALIAS] * 3)
+
+    def test_pin_to_primary(self):
+        db_router.pin_to_primary()
+        self.assertEqual(router.db_for_read(Tag), DEFAULT_DB_ALIAS)
+
+    def test_database_cache_never_reads_from_replica(self):
+        cache_model = DatabaseCache('blog_cache', {}).cache_model_class
+        self.assertEqual([router.db_for_read(cache_model) for _ in range(3)], [DEFAULT_DB_ALIAS] * 3)
+        # Запись в кэш не закрепляет запрос за основной базой
+        self.assertEqual(router.db_for_write(cache_model), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Post), 'replica_1')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica_1', 'blog'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'blog'))
+
+
+class UnreachableReplicaTest(ReplicaTestMixin, SimpleTestCase):
+    replicas = ['replica_1', UNREACHABLE_REPLICA, 'replica_2']
+
+    def test_unreachable_replica_is_skipped(self):
+        self.assertEqual(
+            [router.db_for_read(Post) for _ in range(4)],
+            ['replica_1', 'replica_2', 'replica_1', 'replica_2'],
+        )
+        self.assertEqual([self.read_from() for _ in range(2)], ['replica_1', 'replica_2'])
+
+    @override_settings(DATABASE_REPLICAS=[UNREACHABLE_REPLICA], DATABASE_ROUTERS=ROUTERS)
+    def test_default_is_used_when_all_replicas_are_down(self):
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_unreachable_replica_is_retried_later(self):
+        router.db_for_read(Post)
+        self.assertEqual(router.db_for_read(Post), 'replica_2')
+        replica_router = router.routers[0]
+        replica_router._unavailable_until[UNREACHABLE_REPLICA] = 0
+        directory = os.path.dirname(connections.settings[UNREACHABLE_REPLICA]['NAME'])
+        os.makedirs(directory)
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(connections[UNREACHABLE_REPLICA].close)
+        self.assertEqual(router.db_for_read(Post), 'replica_1')
+        self.assertEqual(router.db_for_read(Post), UNREACHABLE_REPLICA)
+
+
+class ReplicaPinningMiddlewareTest(ReplicaTestMixin, SimpleTestCase):
+    def get_response(self, request):
+        if request.method == 'POST':
+            router.db_for_write(Post)
+        self.read_alias = router.db_for_read(Post)
+        return HttpResponse()
+
+    def call(self, request):
+        return ReplicaPinningMiddleware(self.get_response)(request)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.call(RequestFactory().post('/'))
+        cookie = response.cookies[PIN_COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(self.read_alias, DEFAULT_DB_ALIAS)
+
+    def test_read_does_not_set_pin_cookie(self):
+        response = self.call(RequestFactory().get('/'))
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.read_alias, 'replica_1')
+
+    def test_pin_cookie_pins_reads_to_default(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = '1'
+        self.call(request)
+        self.assertEqual(self.read_alias, DEFAULT_DB_ALIAS)
+
+    def test_pinning_ends_with_request(self):
+        self.call(RequestFactory().post('/'))
+        self.assertEqual(router.db_for_read(Post), 'replica_1')
@@ -0,0 +1,68 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from blog.models import Comment, Post
+
+RECORDS = [
+    {'model': 'tag', 'title': 'Python', 'slug': 'python'},
+    {'model': 'post', 'title': 'Пост', 'slug': 'post', 'author': 'author', 'tags': ['python'],
+     'published_at': '2024-01-01T10:00:00'},
+    {'model': 'comment', 'post': 'post', 'author': 'reader', 'text': 'Первый',
+     'published_at': '2024-01-02T10:00:00'},
+    {'model': 'comment', 'post': 'post', 'author': 'reader', 'text': 'Без даты'},
+    {'model': 'comment', 'post': 'post', 'author': 'reader', 'text': 'Второй',
+     'published_at': '2024-01-03T10:00:00+03:00'},
+]
+
+
+class ImportBlogTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'blog.jsonl')
+        self.state_file = os.path.join(directory.name, 'state.json')
+
+    def write_source(self, records):
+        with open(self.source, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def import_blog(self):
+        call_command(
+            'import_blog', self.source, batch_size=3, state_file=self.state_file,
+            skip_finalize=True, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+    def test_resume_after_unsaved_state_does_not_duplicate_comments(self):
+        self.write_source(RECORDS)
+        self.import_blog()
+        self.assertEqual(Comment.objects.count(), 3)
+
+        # Процесс упал после фиксации последней пачки, но до записи состояния
+        with open(self.state_file, 'w', encoding='utf-8') as file:
+            json.dump({'source': os.path.abspath(self.source), 'line': 3}, file)
+        self.import_blog()
+
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(Post.objects.get().tags.count(), 1)
+
+    def test_invalid_records_are_reported_with_line_number(self):
+        invalid_records = [
+            {'model': 'comment', 'post': 'post', 'text': 'Без автора'},
+            {'model': 'like', 'post': 'post'},
+            {'model': 'post', 'title': 'Пост', 'slug': 'post', 'author': 'author',
+             'published_at': 'вчера'},
+            {'model': 'post', 'title': 'Пост', 'slug': 'post', 'author': 'author',
+             'published_at': '2024-02-30T10:00:00'},
+        ]
+        for record in invalid_records:
+            with self.subTest(record=record):
+                self.write_source([RECORDS[0], record])
+                with self.assertRaisesMessage(CommandError, 'Строка 2'):
+                    call_command('import_blog', self.source, skip_finalize=True, stdout=io.StringIO())
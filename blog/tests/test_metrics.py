@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase, override_settings
+
+from blog.metrics import registry
+
+
+class MetricsAccessTest(SimpleTestCase):
+    @override_settings(BLOG_METRICS_TOKEN='')
+    def test_without_token_only_internal_ips_are_allowed(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    @override_settings(BLOG_METRICS_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsViewLabelTest(SimpleTestCase):
+    @staticmethod
+    def requests_count(view):
+        histogram = registry._histograms.get(('blog_request_duration_seconds', view))
+        return histogram.count if histogram else 0
+
+    def test_admin_index_is_not_counted_as_blog_index(self):
+        blog_index = self.requests_count('index')
+        admin_index = self.requests_count('admin:index')
+
+        self.client.get('/admin/')
+
+        self.assertEqual(self.requests_count('index'), blog_index)
+        self.assertEqual(self.requests_count('admin:index'), admin_index + 1)
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from blog.models import Post, Tag
+from blog.tests.test_query_counts import CACHES, clear_caches
+
+
+# Устаревшие виджеты сайдбара отдаются намеренно, здесь проверяются только карточки
+@override_settings(CACHES=CACHES, BLOG_SIDEBAR_STALE_WHILE_REVALIDATE=False)
+class PostCardCacheTest(TestCase):
+    """Карточки постов в кэше фрагментов обновляются вместе с тем, что выводят"""
+
+    def setUp(self):
+        clear_caches()
+        self.author = User.objects.create(username='author')
+        self.tag = Tag.objects.create(title='Python', slug='python')
+        post = Post.objects.create(title='Пост', slug='post', text='Текст', author=self.author)
+        post.tags.add(self.tag)
+
+    def change(self, instance, **fields):
+        for field, value in fields.items():
+            setattr(instance, field, value)
+        # Поколения кэша сдвигаются после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+
+    def test_tag_slug_change_updates_card_links(self):
+        self.client.get('/')
+        self.change(self.tag, slug='python-3')
+
+        content = self.client.get('/').content.decode()
+        self.assertIn('/tag/python-3/', content)
+        self.assertNotIn('/tag/python/', content)
+
+    def test_author_rename_updates_card(self):
+        self.client.get('/')
+        self.change(self.author, username='new-author')
+        # Логин автора не сдвигает поколений, страница строится заново по ним
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get().save()
+
+        self.assertContains(self.client.get('/'), 'new-author')
+
+    def test_likes_are_shown_only_on_post_page(self):
+        page = self.client.get('/').context['page_posts']
+        self.assertNotIn('likes_amount', page[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get().likes.add(self.author)
+        # Лента от лайков не зависит, а страница поста их показывает
+        self.assertEqual(self.client.get('/').context['page_posts'], page)
+        self.assertContains(self.client.get('/post/post'), '1 people like this')
@@ -0,0 +1,75 @@
+"""
+Число SQL-запросов страниц не должно зависеть от числа постов на них.
+
+Общий кэш в тестах хранится в памяти, поэтому считаются только запросы к
+данным, а не к таблице DatabaseCache.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from blog.models import Comment, Post, Tag
+from sensive_blog.cache import TieredCache
+
+PAGE_SIZES = (1, 25)
+TAGS_PER_POST = 3
+
+CACHES = {
+    **settings.CACHES,
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+        if isinstance(cache, TieredCache):
+            cache.clear_local()
+
+
+@override_settings(CACHES=CACHES)
+class ViewQueryCountTest(TestCase):
+    def create_posts(self, count):
+        """count постов с count комментариями и общими тегами, чтобы
+        страница тега и комментарии поста заполнялись вместе с count"""
+        Post.objects.all().delete()
+        Tag.objects.all().delete()
+        author = User.objects.get_or_create(username='author')[0]
+        readers = [User.objects.get_or_create(username=f'reader{i}')[0] for i in range(3)]
+        tags = [Tag.objects.create(title=f'Тег {i}', slug=f'tag-{i}') for i in range(TAGS_PER_POST)]
+
+        for number in range(count):
+            post = Post.objects.create(
+                title=f'Пост {number}',
+                slug=f'post-{number}',
+                text='Текст поста',
+                author=author,
+            )
+            post.tags.set(tags)
+            post.likes.set(readers)
+            for _ in range(count):
+                Comment.objects.create(post=post, author=readers[0], text='Комментарий')
+        return tags[0]
+
+    def assert_constant_queries(self, get_path, cold, warm):
+        for count in PAGE_SIZES:
+            with self.subTest(posts=count):
+                tag = self.create_posts(count)
+                path = get_path(tag)
+                clear_caches()
+                with self.assertNumQueries(cold):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(warm):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_index(self):
+        self.assert_constant_queries(lambda tag: '/', cold=5, warm=0)
+
+    def test_post_detail(self):
+        self.assert_constant_queries(lambda tag: '/post/post-0', cold=8, warm=4)
+
+    def test_tag_filter(self):
+        self.assert_constant_queries(lambda tag: f'/tag/{tag.slug}/', cold=7, warm=0)
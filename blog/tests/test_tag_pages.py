@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from blog.models import Post, Tag
+from blog.tests.test_query_counts import CACHES, clear_caches
+
+
+@override_settings(CACHES=CACHES, BLOG_SIDEBAR_STALE_WHILE_REVALIDATE=False)
+@mock.patch('blog.views.POSTS_PER_PAGE', 2)
+class TagPageOrderingTest(TestCase):
+    def setUp(self):
+        clear_caches()
+        author = User.objects.create(username='author')
+        readers = [User.objects.create(username=f'reader{number}') for number in range(3)]
+        tag = Tag.objects.create(title='Python', slug='python')
+        # Новые посты — с меньшим числом лайков, порядки не совпадают
+        for number, likes in enumerate([3, 1, 2]):
+            post = Post.objects.create(title=f'Пост {number}', slug=f'post-{number}', text='Текст', author=author)
+            post.tags.add(tag)
+            post.likes.add(*readers[:likes])
+
+    def get_titles(self, sort):
+        """Заголовки всех страниц тега, проходя по курсорам вперёд"""
+        titles = []
+        cursor = None
+        while True:
+            params = {'sort': sort, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get('/tag/python/', params)
+            titles += [post['title'] for post in response.context['posts']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                return titles
+
+    def test_recent(self):
+        self.assertEqual(self.get_titles('recent'), ['Пост 2', 'Пост 1', 'Пост 0'])
+
+    def test_popular(self):
+        self.assertEqual(self.get_titles('popular'), ['Пост 0', 'Пост 2', 'Пост 1'])
+
+    def test_popular_follows_likes(self):
+        self.get_titles('popular')
+        post = Post.objects.get(slug='post-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.likes.add(*User.objects.filter(username__startswith='reader'))
+        self.assertEqual(self.get_titles('popular'), ['Пост 1', 'Пост 0', 'Пост 2'])
+
+    def test_unknown_sort(self):
+        self.assertEqual(self.client.get('/tag/python/', {'sort': 'title'}).status_code, 404)
+
+    def test_cursor_of_other_sort(self):
+        cursor = self.client.get('/tag/python/', {'sort': 'recent'}).context['next_cursor']
+        response = self.client.get('/tag/python/', {'sort': 'popular', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
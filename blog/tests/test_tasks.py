@@ -0,0 +1,57 @@
+"""
+Задачи очереди, которые могут прийти раньше репликации своих данных.
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from blog.comments import process_comment
+from blog.likes import _apply_batch, flush_like_intents, record_like_intent
+from blog.models import Comment, LikeIntent, Post
+from blog.renditions import update_post_renditions
+from blog.tests.test_query_counts import CACHES
+
+
+class ProcessCommentTest(TestCase):
+    def test_missing_comment_is_retried(self):
+        # Ошибка, а не тихий выход: по ней очередь повторит задачу
+        with self.assertRaises(Comment.DoesNotExist):
+            process_comment(0)
+
+
+@override_settings(CACHES=CACHES)
+class FlushLikeIntentsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.post = Post.objects.create(title='Пост', slug='post', text='Текст', author=self.user)
+
+    def test_flush_applies_intents(self):
+        record_like_intent(self.user.pk, self.post.pk, liked=True)
+        record_like_intent(self.user.pk, self.post.pk, liked=False)
+        record_like_intent(self.user.pk, self.post.pk, liked=True)
+
+        self.assertEqual(flush_like_intents(batch_size=2), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertFalse(LikeIntent.objects.exists())
+
+    def test_batch_deletes_only_read_intents(self):
+        late = LikeIntent.objects.create(user=self.user, post=self.post, liked=False)
+        read = LikeIntent.objects.create(user=self.user, post=self.post, liked=True)
+
+        # late закоммичено после того, как пачка прочитана
+        _apply_batch([(read.pk, self.user.pk, self.post.pk, True)])
+        self.assertQuerySetEqual(LikeIntent.objects.all(), [late])
+
+
+class UpdatePostRenditionsTest(TestCase):
+    def test_missing_post_is_retried(self):
+        with self.assertRaises(Post.DoesNotExist):
+            update_post_renditions(0)
+
+    def test_missing_image_file_is_retried(self):
+        author = User.objects.create(username='author')
+        post = Post.objects.create(title='Пост', slug='post', text='Текст', author=author)
+        # update, чтобы сигнал не поставил задачу сам
+        Post.objects.filter(pk=post.pk).update(image='missing/image.jpg')
+        with self.assertRaises(FileNotFoundError):
+            update_post_renditions(post.pk)
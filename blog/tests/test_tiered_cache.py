@@ -0,0 +1,42 @@
+"""
+Журнал инвалидаций TieredCache поверх DatabaseCache из настроек по умолчанию.
+
+Два экземпляра с разными LOCATION получают разные L1 и изображают два
+процесса с общим L2.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.test import TestCase
+
+from sensive_blog.cache import SEQUENCE_KEY, DatabaseSequence, TieredCache
+
+
+def make_tiered_cache(location):
+    return TieredCache(location, {'OPTIONS': {'SHARED_CACHE': 'shared', 'SYNC_INTERVAL': 0}})
+
+
+class DatabaseSequenceTest(TestCase):
+    def setUp(self):
+        self.shared = caches['shared']
+        if not isinstance(self.shared, DatabaseCache):
+            self.skipTest('Общий кэш не DatabaseCache')
+        self.shared.clear()
+
+    def test_reserve_returns_last_number(self):
+        sequence = DatabaseSequence(self.shared, SEQUENCE_KEY)
+        self.assertEqual(sequence.get(), 0)
+        self.assertEqual(sequence.reserve(3), 3)
+        self.assertEqual(sequence.reserve(2), 5)
+        self.assertEqual(sequence.get(), 5)
+
+    def test_change_in_one_process_evicts_key_from_another(self):
+        writer, reader = make_tiered_cache('writer'), make_tiered_cache('reader')
+        for tiered in (writer, reader):
+            tiered.clear_local()
+        writer.set('key', 1)
+        self.assertEqual(reader.get('key'), 1)
+
+        writer.replace('key', 2)
+        writer.delete('other')
+        self.assertEqual(reader.get('key'), 2)
+        self.assertEqual(DatabaseSequence(self.shared, SEQUENCE_KEY).get(), 2)
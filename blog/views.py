@@ -1,95 +1,394 @@
-from django.shortcuts import render, get_object_or_404
-from django.views.decorators.cache import cache_page
-from django.core.cache import cache
-from blog.models import Post, Tag
+import hashlib
+import time
+
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect, render, get_object_or_404
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from blog import cache
+from blog.comments import MAX_COMMENT_LENGTH, process_comment
+from blog.likes import record_like_intent
+from blog.models import Comment, Post, Tag, TagPostIndex
+from blog.renditions import build_srcset, get_renditions
+from blog.pagination import InvalidCursor, is_forward_cursor, paginate
+from blog.search import search_posts
+from blog.slugs import get_post_by_slug, get_tag_by_slug
+from blog.tasks import enqueue_on_commit
+
+POSTS_PER_PAGE = 20
+COMMENTS_PER_PAGE = 20
+# Сортировки страницы тега: ключи курсора в TagPostIndex, по каждой есть индекс
+TAG_POSTS_ORDERINGS = {
+    'recent': ('published_at', 'post_id'),
+    'popular': ('likes_count', 'post_id'),
+}
+CONTENT_NAMESPACES = [
+    cache.POSTS, cache.FEED, cache.LIKES, cache.COMMENTS, cache.TAGS, cache.RANKING,
+]
 
 def serialize_tag(tag):
     return {
+        'cache_version': f'{tag.pk}:{tag.slug}:{tag.title}:{tag.posts_count}',
         'title': tag.title,
+        'slug': tag.slug,
         'posts_with_tag': tag.posts_count,
     }
 
 def serialize_post(post):
+    # Теги берутся только из префетча: first() и exists() сделали бы
+    # по отдельному запросу на каждый пост
+    tags = list(post.tags.all())
+    # Версия карточки для кэша фрагментов: меняется при правке поста,
+    # изменении комментариев, тегов или логина автора, то есть всего, что
+    # выводит карточка. Лайков карточки не выводят, поэтому их нет ни здесь,
+    # ни в данных, и страницы ленты не зависят от поколения LIKES
+    cache_version = ':'.join([
+        str(post.updated_at.timestamp()),
+        str(post.comments_count),
+        post.author.username,
+        *(f'{tag.pk}-{tag.slug}-{tag.title}' for tag in tags),
+    ])
+    widths = get_renditions(post.image.name, post.image_renditions)
     return {
+        'id': post.pk,
+        'cache_version': cache_version,
         'title': post.title,
         'teaser_text': post.text[:200],
         'author': post.author.username,
         'comments_amount': post.comments_count,
-        'likes_amount': post.likes_count,
         'image_url': post.image.url if post.image else None,
+        'image_srcset': build_srcset(post.image.name, widths, 'webp'),
+        'image_jpeg_srcset': build_srcset(post.image.name, widths, 'jpeg'),
         'published_at': post.published_at,
         'slug': post.slug,
-        'tags': [serialize_tag(tag) for tag in post.tags.all()],
-        'first_tag_title': post.tags.first().title if post.tags.exists() else None,
+        'tags': [serialize_tag(tag) for tag in tags],
+        'first_tag_title': tags[0].title if tags else None,
+        'first_tag_slug': tags[0].slug if tags else None,
     }
 
 
-def get_popular_tags():
-    cache_key = 'popular_tags_serialized'
-    serialized_tags = cache.get(cache_key)
+def build_popular_tags():
+    tags = Tag.objects.popular()[:5]
+    return [serialize_tag(tag) for tag in tags]
+
 
-    if not serialized_tags:
-        tags = Tag.objects.popular()[:5]
-        serialized_tags = [serialize_tag(tag) for tag in tags]
-        cache.set(cache_key, serialized_tags, 60 * 15)
+def build_most_popular_posts():
+    posts = Post.objects.popular() \
+                .with_comments_count() \
+                .with_prefetched_tags() \
+                .select_related('author')[:5]
+    return [serialize_post(post) for post in posts]
 
-    return serialized_tags
+
+def get_sidebar_widget(name, namespaces, build):
+    if settings.BLOG_SIDEBAR_STALE_WHILE_REVALIDATE:
+        return cache.get_or_build_stale(
+            name,
+            namespaces,
+            build,
+            soft_ttl=settings.BLOG_SIDEBAR_SOFT_TTL,
+            hard_ttl=settings.BLOG_SIDEBAR_HARD_TTL,
+        )
+    return cache.get_or_build(name, namespaces, build)
+
+
+def serialize_comment(comment):
+    return {
+        'author': comment.author.username,
+        'text': comment.text,
+        'published_at': comment.published_at,
+    }
+
+
+def get_post_or_404(slug):
+    post = get_post_by_slug(slug)
+    if post is None:
+        raise Http404('Пост не найден')
+    return post
+
+
+def get_comments_page(post_id, cursor):
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    try:
+        page = paginate(comments, cursor, COMMENTS_PER_PAGE, descending=False)
+    except InvalidCursor:
+        raise Http404('Некорректный курсор')
+    return [serialize_comment(comment) for comment in page.items], page.next_cursor
+
+
+def get_popular_tags():
+    return get_sidebar_widget(
+        'popular_tags_serialized',
+        [cache.TAGS],
+        build_popular_tags,
+    )
 
 
 def get_most_popular_posts():
-    cache_key = 'most_popular_posts_serialized'
-    serialized_posts = cache.get(cache_key)
+    return get_sidebar_widget(
+        'most_popular_posts_serialized',
+        [cache.POSTS, cache.FEED, cache.LIKES, cache.COMMENTS, cache.TAGS, cache.RANKING],
+        build_most_popular_posts,
+    )
+
+
+def build_posts_page(posts, cursor):
+    page = paginate(
+        posts.with_comments_count()
+             .with_prefetched_tags()
+             .select_related('author'),
+        cursor,
+        POSTS_PER_PAGE,
+    )
+    return {
+        'posts': [serialize_post(post) for post in page.items],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def build_tag_posts_page(tag_id, cursor, sort='recent'):
+    # Id постов страницы берутся из TagPostIndex, а сами посты одним
+    # запросом по первичному ключу
+    keys = TAG_POSTS_ORDERINGS[sort]
+    page = paginate(
+        TagPostIndex.objects.filter(tag_id=tag_id).values(*keys),
+        cursor,
+        POSTS_PER_PAGE,
+        keys=keys,
+    )
+    post_ids = [row['post_id'] for row in page.items]
+    posts = Post.objects.with_comments_count() \
+        .with_prefetched_tags() \
+        .select_related('author') \
+        .in_bulk(post_ids)
+    return {
+        'posts': [serialize_post(posts[post_id]) for post_id in post_ids if post_id in posts],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def get_posts_page(scope, cursor, build, by_likes=False):
+    # Новый пост попадает только в голову ленты, поэтому от поколения
+    # FEED зависят лишь первая страница и страницы, открытые курсором назад.
+    # В сортировке по лайкам новый пост встаёт в конец, а лайк двигает пост
+    # по всем страницам, поэтому они зависят от FEED и LIKES целиком
+    try:
+        is_deep_page = cursor is not None and is_forward_cursor(cursor)
+    except InvalidCursor:
+        raise Http404('Некорректный курсор')
+
+    namespaces = [cache.POSTS, cache.COMMENTS, cache.TAGS]
+    if by_likes:
+        namespaces += [cache.FEED, cache.LIKES]
+    elif not is_deep_page:
+        namespaces.append(cache.FEED)
+
+    try:
+        return cache.get_or_build(
+            f'posts_page:{scope}:{cursor or "head"}',
+            namespaces,
+            build,
+        )
+    except InvalidCursor:
+        raise Http404('Некорректный курсор')
+
+
+def build_etag(request, *parts):
+    """ETag страницы по поколениям кэша, без запросов к данным страницы
 
-    if not serialized_posts:
-        posts = Post.objects.popular() \
-                    .with_comments_count() \
-                    .with_prefetched_tags() \
-                    .select_related('author')[:5]
+    Пока виджеты отдаются устаревшими, в ETag входит номер интервала
+    BLOG_SIDEBAR_SOFT_TTL, иначе клиент получал бы 304 на устаревшую страницу
+    до следующего изменения данных.
+    """
+    generations = cache.get_generations(CONTENT_NAMESPACES)
+    stale_period = 0
+    if settings.BLOG_SIDEBAR_STALE_WHILE_REVALIDATE:
+        stale_period = int(time.time() // settings.BLOG_SIDEBAR_SOFT_TTL)
 
-        serialized_posts = [serialize_post(post) for post in posts]
-        cache.set(cache_key, serialized_posts, 60 * 15)
+    raw_etag = ':'.join([
+        request.get_full_path(),
+        *(str(generations[namespace]) for namespace in CONTENT_NAMESPACES),
+        str(stale_period),
+        *(str(part) for part in parts),
+    ])
+    return hashlib.md5(raw_etag.encode()).hexdigest()
 
-    return serialized_posts
 
+def index_etag(request):
+    return build_etag(request)
 
-@cache_page(60 * 15)
+
+def post_detail_etag(request, slug):
+    # Счётчик комментариев обновляется в фоне, поэтому новый комментарий
+    # меняет ETag через id последнего комментария. На странице форма
+    # с CSRF-токеном, поэтому ETag зависит и от пользователя
+    last_comment_id = Comment.objects.filter(post=OuterRef('pk')) \
+        .order_by('-published_at', '-id') \
+        .values('id')[:1]
+    post = get_post_by_slug(slug)
+    if post is None:
+        return None
+    post_state = Post.objects.filter(pk=post['id']) \
+        .annotate(last_comment_id=Subquery(last_comment_id)) \
+        .values_list('pk', 'updated_at', 'likes_count', 'comments_count', 'last_comment_id') \
+        .first()
+    if post_state is None:
+        return None
+    return build_etag(request, *post_state, request.user.pk)
+
+
+def tag_filter_etag(request, tag_slug):
+    return build_etag(request)
+
+
+@condition(etag_func=index_etag)
 def index(request):
+    cursor = request.GET.get('cursor')
+    page = get_posts_page('all', cursor, lambda: build_posts_page(Post.objects.all(), cursor))
+
     context = {
         'most_popular_posts': get_most_popular_posts(),
+        'page_posts': page['posts'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
         'popular_tags': get_popular_tags(),
     }
     return render(request, 'index.html', context)
 
 
-def post_detail(request, slug):
+def get_post_with_comments(slug):
     post = get_object_or_404(
         Post.objects
         .with_comments_count()
         .with_prefetched_tags()
         .select_related('author'),
-        slug=slug
+        pk=get_post_or_404(slug)['id'],
     )
 
+    comments, next_comments_cursor = get_comments_page(post.pk, None)
+    return {
+        **serialize_post(post),
+        'text': post.text,
+        'likes_amount': post.likes_count,
+        'comments': comments,
+        'next_comments_cursor': next_comments_cursor,
+    }
+
+
+@cache_control(private=True)
+@condition(etag_func=post_detail_etag)
+def post_detail(request, slug):
     context = {
-        'post': serialize_post(post),
+        'post': get_post_with_comments(slug),
         'popular_tags': get_popular_tags(),
         'most_popular_posts': get_most_popular_posts(),
     }
     return render(request, 'post-details.html', context)
 
+
+def post_comments(request, slug):
+    post = get_post_or_404(slug)
+    comments, next_cursor = get_comments_page(post['id'], request.GET.get('cursor'))
+
+    if request.GET.get('format') == 'html':
+        context = {
+            'post': {'slug': post['slug'], 'next_comments_cursor': next_cursor},
+            'comments': comments,
+        }
+        return render(request, 'comments-list.html', context)
+
+    return JsonResponse({'comments': comments, 'next_cursor': next_cursor})
+
+def get_tag_posts_page(tag_slug, cursor, sort='recent'):
+    if sort not in TAG_POSTS_ORDERINGS:
+        raise Http404('Неизвестная сортировка')
+    tag = get_tag_by_slug(tag_slug)
+    if tag is None:
+        raise Http404('Тег не найден')
+    page = get_posts_page(
+        f'tag:{tag["id"]}:{sort}',
+        cursor,
+        lambda: build_tag_posts_page(tag['id'], cursor, sort),
+        by_likes=sort == 'popular',
+    )
+    return tag, page
+
+
+@require_POST
+def add_comment(request, slug):
+    # Комментарий сохраняется сразу, остальное делает process_comment в фоне
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    text = request.POST.get('text', '').strip()
+    if not text or len(text) > MAX_COMMENT_LENGTH:
+        return HttpResponseBadRequest(f'Комментарий должен быть от 1 до {MAX_COMMENT_LENGTH} символов')
+
+    post_id = get_post_or_404(slug)['id']
+    comment = Comment(post_id=post_id, author=request.user, text=text)
+    comment.deferred_processing = True
+    comment.save()
+    enqueue_on_commit(process_comment, comment.pk)
+    return redirect(f'{reverse("post_detail", args=[slug])}#comments')
+
+
+@require_POST
+def like_post(request, slug):
+    # Лайк только записывается в буфер, в Post.likes его перенесёт flush_likes
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    action = request.POST.get('action', 'like')
+    if action not in ('like', 'unlike'):
+        return JsonResponse({'error': 'action должен быть like или unlike'}, status=400)
+
+    post_id = get_post_or_404(slug)['id']
+    record_like_intent(request.user.pk, post_id, liked=action == 'like')
+    return JsonResponse({'action': action}, status=202)
+
+
+@condition(etag_func=tag_filter_etag)
 def tag_filter(request, tag_slug):
-    tag = get_object_or_404(Tag.objects.popular(), slug=tag_slug)
+    sort = request.GET.get('sort', 'recent')
+    tag, page = get_tag_posts_page(tag_slug, request.GET.get('cursor'), sort)
+
+    context = {
+        'tag': tag['title'],
+        'sort': sort,
+        'popular_tags': get_popular_tags(),
+        'posts': page['posts'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
+        'most_popular_posts': get_most_popular_posts(),
+    }
+    return render(request, 'posts-list.html', context)
 
-    related_posts = Post.objects.filter(tags=tag) \
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+
+    found_ids = search_posts(query, POSTS_PER_PAGE) if query else []
+    if found_ids is None:
+        found_ids = Post.objects.filter(
+            Q(title__icontains=query) | Q(text__icontains=query)
+        ).values_list('pk', flat=True)[:POSTS_PER_PAGE]
+
+    found_posts = Post.objects.filter(pk__in=list(found_ids)) \
         .with_comments_count() \
         .with_prefetched_tags() \
-        .select_related('author') \
-        .distinct()[:20]
+        .select_related('author')
+    posts_by_id = {post.pk: post for post in found_posts}
 
     context = {
-        'tag': tag.title,
+        'search_query': query,
         'popular_tags': get_popular_tags(),
-        'posts': [serialize_post(post) for post in related_posts],
+        'posts': [
+            serialize_post(posts_by_id[post_id])
+            for post_id in found_ids if post_id in posts_by_id
+        ],
         'most_popular_posts': get_most_popular_posts(),
     }
     return render(request, 'posts-list.html', context)
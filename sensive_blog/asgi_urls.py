@@ -0,0 +1,12 @@
+from django.urls import path
+
+from blog import async_views
+from sensive_blog.urls import urlpatterns as sync_urlpatterns
+
+# Страницы чтения заменены асинхронными, остальные маршруты те же
+urlpatterns = [
+    path('tag/<slug:tag_slug>/', async_views.tag_filter, name='tag_filter'),
+    path('post/<slug:slug>', async_views.post_detail, name='post_detail'),
+    path('', async_views.index, name='index'),
+    *sync_urlpatterns,
+]
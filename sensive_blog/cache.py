@@ -0,0 +1,337 @@
+"""
+Двухуровневый кэш: небольшой LRU в памяти процесса поверх общего кэша.
+
+Общий кэш (L2) задаётся отдельным алиасом в CACHES, например Redis или
+таблица DatabaseCache. Удаление, incr и replace записывают ключ в журнал
+инвалидаций в L2, а процессы раз в SYNC_INTERVAL секунд читают журнал и
+выкидывают изменённые ключи из своего L1. set и add в журнал не пишут:
+ключи с поколением в имени и ключи фрагментов шаблонов на месте не
+меняются, а изменяемый ключ перезаписывается через replace. Короткий
+LOCAL_TIMEOUT ограничивает устаревание L1, даже если журнал потерян.
+
+Номер записи в журнале должен выдаваться атомарно: если два процесса
+получат один номер, одна запись перезапишет другую, и её ключ останется в
+чужих L1 до LOCAL_TIMEOUT, а пропуск никто не заметит. Redis и memcached
+увеличивают счётчик атомарно, а incr DatabaseCache — это get и set,
+поэтому для него счётчик хранится отдельной строкой таблицы и
+увеличивается одним SQL-запросом, см. DatabaseSequence. Это умеют SQLite
+и PostgreSQL, с другими базами нужен Redis.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+
+SEQUENCE_KEY = 'tiered:invalidation:seq'
+ENTRY_KEY = 'tiered:invalidation:{}'
+LOG_TIMEOUT = 5 * 60
+MAX_LOG_READ = 1000
+
+# Экземпляры бэкендов Django создаёт отдельно для каждого потока,
+# а L1 и состояние синхронизации должны быть общими на весь процесс
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LRUCache:
+    """Потокобезопасный LRU-словарь с временем жизни записей"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Значение и признак попадания"""
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                return None, False
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None, False
+            self._data.move_to_end(key)
+            return value, True
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LocalTier:
+    """L1 процесса и позиция в журнале инвалидаций, до которой он синхронизирован"""
+
+    def __init__(self, max_entries):
+        self.entries = LRUCache(max_entries)
+        self.token = uuid.uuid4().hex
+        self.sync_lock = threading.Lock()
+        self.synced_at = 0
+        self.seen_sequence = None
+
+
+class DatabaseSequence:
+    """Атомарный счётчик в таблице DatabaseCache
+
+    Значение лежит в строке таблицы числом, а не в pickle, чтобы база могла
+    увеличить его сама, поэтому читать его можно только через этот класс.
+    Строка не истекает. Если DatabaseCache удалит её при переполнении или
+    clear(), счётчик начнётся заново, а процессы, увидев номер меньше
+    прочитанного, очистят свои L1.
+    """
+
+    VENDORS = ('sqlite', 'postgresql')
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = cache.make_and_validate_key(key)
+
+    def _connection(self):
+        connection = connections[router.db_for_write(self.cache.cache_model_class)]
+        if connection.vendor not in self.VENDORS:
+            raise ImproperlyConfigured(
+                f'Журнал инвалидаций в DatabaseCache не поддерживает {connection.vendor}, '
+                'укажите общий кэш с атомарным incr, например Redis'
+            )
+        return connection
+
+    def reserve(self, count):
+        """Увеличивает счётчик на count и возвращает новое значение"""
+        connection = self._connection()
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.cache._table)
+        cache_key, value, expires = (quote_name(column) for column in ('cache_key', 'value', 'expires'))
+        never = connection.ops.adapt_datetimefield_value(datetime.max.replace(microsecond=0))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({cache_key}, {value}, {expires}) VALUES (%s, %s, %s) '
+                f'ON CONFLICT ({cache_key}) DO UPDATE '
+                f'SET {value} = CAST(CAST({table}.{value} AS bigint) + %s AS text) '
+                f'RETURNING {value}',
+                [self.key, str(count), never, count],
+            )
+            return int(cursor.fetchone()[0])
+
+    def get(self):
+        connection = self._connection()
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {quote_name("value")} FROM {quote_name(self.cache._table)} '
+                f'WHERE {quote_name("cache_key")} = %s',
+                [self.key],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+
+def get_local_tier(name, max_entries):
+    with _local_tiers_lock:
+        if name not in _local_tiers:
+            _local_tiers[name] = LocalTier(max_entries)
+        return _local_tiers[name]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._tier = get_local_tier(
+            location or self._shared_alias,
+            options.get('LOCAL_MAX_ENTRIES', 1000),
+        )
+        self._local = self._tier.entries
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _local_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        local_timeout = self._local_timeout_for(timeout)
+        if local_timeout > 0:
+            self._local.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), local_timeout)
+
+    def _reserve_sequence(self, count):
+        """Выдаёт count номеров журнала и возвращает последний"""
+        shared = self._shared
+        if isinstance(shared, DatabaseCache):
+            return DatabaseSequence(shared, SEQUENCE_KEY).reserve(count)
+        try:
+            return shared.incr(SEQUENCE_KEY, count)
+        except ValueError:
+            shared.add(SEQUENCE_KEY, 0, None)
+            return shared.incr(SEQUENCE_KEY, count)
+
+    def _current_sequence(self):
+        shared = self._shared
+        if isinstance(shared, DatabaseCache):
+            return DatabaseSequence(shared, SEQUENCE_KEY).get()
+        return shared.get(SEQUENCE_KEY, 0)
+
+    def _publish(self, *keys):
+        """Записывает изменённые ключи в журнал, чтобы их выкинули из L1 других процессов"""
+        if not keys:
+            return
+        last = self._reserve_sequence(len(keys))
+        first = last - len(keys) + 1
+        self._shared.set_many(
+            {
+                ENTRY_KEY.format(sequence): (self._tier.token, key)
+                for sequence, key in zip(range(first, last + 1), keys)
+            },
+            LOG_TIMEOUT,
+        )
+
+    def _sync(self):
+        """Применяет журнал инвалидаций не чаще раза в SYNC_INTERVAL секунд"""
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.synced_at < self._sync_interval:
+            return
+        if not tier.sync_lock.acquire(blocking=False):
+            return
+        try:
+            tier.synced_at = now
+            sequence = self._current_sequence()
+            seen = tier.seen_sequence
+            tier.seen_sequence = sequence
+            if seen is None or sequence == seen:
+                return
+            if sequence < seen or sequence - seen > MAX_LOG_READ:
+                self._local.clear()
+                return
+
+            entry_keys = [ENTRY_KEY.format(number) for number in range(seen + 1, sequence + 1)]
+            changed = self._shared.get_many(entry_keys)
+            if len(changed) < len(entry_keys):
+                self._local.clear()
+                return
+            for token, key in changed.values():
+                # Свои записи процесс уже применил к L1 в момент изменения
+                if token != tier.token:
+                    self._local.delete(key)
+        finally:
+            tier.sync_lock.release()
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        local_key = self.make_and_validate_key(key, version=version)
+        value, hit = self._local.get(local_key)
+        if hit:
+            return pickle.loads(value)
+
+        missing = object()
+        value = self._shared.get(key, missing, version=version)
+        if value is missing:
+            return default
+        self._remember(local_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._shared.set(key, value, timeout, version=version)
+        self._remember(local_key, value, timeout)
+
+    def replace(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """set для ключа, старое значение которого могли прочитать другие процессы"""
+        self.set(key, value, timeout, version=version)
+        self._publish(self.make_and_validate_key(key, version=version))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self._shared.add(key, value, timeout, version=version)
+        if added:
+            self._local.delete(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local.delete(local_key)
+        deleted = self._shared.delete(key, version=version)
+        self._publish(local_key)
+        return deleted
+
+    def has_key(self, key, version=None):
+        self._sync()
+        local_key = self.make_and_validate_key(key, version=version)
+        return self._local.get(local_key)[1] or self._shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._shared.incr(key, delta, version=version)
+        self._local.delete(local_key)
+        self._publish(local_key)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value, hit = self._local.get(self.make_and_validate_key(key, version=version))
+            if hit:
+                found[key] = pickle.loads(value)
+            else:
+                missing.append(key)
+
+        if missing:
+            shared_found = self._shared.get_many(missing, version=version)
+            for key, value in shared_found.items():
+                self._remember(self.make_and_validate_key(key, version=version), value)
+            found.update(shared_found)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        local_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        for local_key in local_keys:
+            self._local.delete(local_key)
+        self._shared.delete_many(keys, version=version)
+        self._publish(*local_keys)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+
+    def clear_local(self):
+        """Очищает только L1 текущего процесса"""
+        self._local.clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
@@ -0,0 +1,117 @@
+"""
+Чтение с реплик, запись в основную базу.
+
+Чтения распределяются по репликам из settings.DATABASE_REPLICAS по кругу,
+недоступная реплика пропускается REPLICA_RETRY_INTERVAL секунд. После
+записи запрос до конца читает из основной базы, а ReplicaPinningMiddleware
+ставит cookie, чтобы и следующие REPLICA_STICKY_SECONDS секунд
+пользователь видел свои изменения, даже если реплики отстают.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE_NAME = 'pin_primary'
+REPLICA_RETRY_INTERVAL = 30
+
+# Кэш в базе данных должен всегда читать то, что только что записал,
+# а запись в него не означает, что пользователь что-то изменил
+CACHE_APP_LABEL = 'django_cache'
+
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+_wrote_to_primary = ContextVar('wrote_to_primary', default=False)
+
+
+def pin_to_primary():
+    _pinned_to_primary.set(True)
+
+
+class PrimaryReplicaRouter:
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+        self._next_replica = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._unavailable_until = {}
+
+    def _is_available(self, alias):
+        if self._unavailable_until.get(alias, 0) > time.monotonic():
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            self._unavailable_until[alias] = time.monotonic() + REPLICA_RETRY_INTERVAL
+            return False
+        return True
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or _pinned_to_primary.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+
+        for _ in self.replicas:
+            with self._lock:
+                alias = next(self._next_replica)
+            if self._is_available(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != CACHE_APP_LABEL:
+            _pinned_to_primary.set(True)
+            _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик обновляет репликация с основной базы
+        return db not in self.replicas
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pinned_token = _pinned_to_primary.set(PIN_COOKIE_NAME in request.COOKIES)
+        wrote_token = _wrote_to_primary.set(False)
+        try:
+            return self.set_pin_cookie(self.get_response(request))
+        finally:
+            _pinned_to_primary.reset(pinned_token)
+            _wrote_to_primary.reset(wrote_token)
+
+    async def __acall__(self, request):
+        pinned_token = _pinned_to_primary.set(PIN_COOKIE_NAME in request.COOKIES)
+        wrote_token = _wrote_to_primary.set(False)
+        try:
+            return self.set_pin_cookie(await self.get_response(request))
+        finally:
+            _pinned_to_primary.reset(pinned_token)
+            _wrote_to_primary.reset(wrote_token)
+
+    @staticmethod
+    def set_pin_cookie(response):
+        if _wrote_to_primary.get():
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -1,4 +1,6 @@
 import os
+
+import dj_database_url
 from environs import Env
 
 env = Env()
@@ -25,6 +27,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.metrics.MetricsMiddleware',
+    'sensive_blog.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -35,7 +39,9 @@ MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
-ROOT_URLCONF = 'sensive_blog.urls'
+# asgi.py включает асинхронные версии страниц чтения
+BLOG_ASYNC_VIEWS = env.bool('BLOG_ASYNC_VIEWS', False)
+ROOT_URLCONF = 'sensive_blog.asgi_urls' if BLOG_ASYNC_VIEWS else 'sensive_blog.urls'
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATICFILES_DIRS = [
@@ -45,7 +51,7 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'blog.metrics.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATE_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -69,6 +75,40 @@ DATABASES = {
     }
 }
 
+if env.str('DATABASE_URL', None):
+    DATABASES['default'] = env.dj_db_url('DATABASE_URL')
+
+DATABASE_REPLICAS = []
+for number, replica_url in enumerate(env.list('DATABASE_REPLICA_URLS', []), start=1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **dj_database_url.parse(replica_url),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Настройки SQLite для продакшена: WAL не блокирует читателей на время
+# записи, а постоянные соединения не открывают файл базы на каждый запрос
+SQLITE_PRODUCTION = env.bool('SQLITE_PRODUCTION', False)
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': env.int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', 5000),
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS if SQLITE_PRODUCTION else {}
+
+if SQLITE_PRODUCTION:
+    for database in DATABASES.values():
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            database['CONN_MAX_AGE'] = env.int('SQLITE_CONN_MAX_AGE', 600)
+            database['CONN_HEALTH_CHECKS'] = True
+            database.setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+DATABASE_ROUTERS = ['sensive_blog.db_router.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', 15)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',  # noqa: E501
@@ -104,9 +144,63 @@ INTERNAL_IPS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+REDIS_URL = env.str('REDIS_URL', None)
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'max_connections': env.int('REDIS_MAX_CONNECTIONS', 50),
+        },
+    }
+else:
+    # По умолчанию DatabaseCache держит 300 записей и при переполнении
+    # удаляет первые по алфавиту ключи, а это поколения blog:generation:*
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'blog_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', 100000),
+        },
+    }
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
\ No newline at end of file
+        'BACKEND': 'sensive_blog.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', 1000),
+            'LOCAL_TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT', 5),
+            'SYNC_INTERVAL': env.float('CACHE_SYNC_INTERVAL', 1),
+        },
+    },
+    # Слаги постов и тегов, см. blog.slugs. Свой L1, чтобы поток
+    # несуществующих адресов не вытеснял из LRU виджеты и страницы
+    'slugs': {
+        'BACKEND': 'sensive_blog.cache.TieredCache',
+        'LOCATION': 'slugs',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_SLUGS_MAX_ENTRIES', 10000),
+            'LOCAL_TIMEOUT': env.int('CACHE_SLUGS_LOCAL_TIMEOUT', 60),
+            'SYNC_INTERVAL': env.float('CACHE_SYNC_INTERVAL', 1),
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+BLOG_SIDEBAR_STALE_WHILE_REVALIDATE = env.bool(
+    'BLOG_SIDEBAR_STALE_WHILE_REVALIDATE', True)
+BLOG_SIDEBAR_SOFT_TTL = env.int('BLOG_SIDEBAR_SOFT_TTL', 60)
+BLOG_SIDEBAR_HARD_TTL = env.int('BLOG_SIDEBAR_HARD_TTL', 60 * 60 * 24)
+
+BLOG_TASK_WORKERS = env.int('BLOG_TASK_WORKERS', 2)
+BLOG_TASK_QUEUE_SIZE = env.int('BLOG_TASK_QUEUE_SIZE', 1000)
+BLOG_TASK_MAX_RETRIES = env.int('BLOG_TASK_MAX_RETRIES', 3)
+BLOG_TASK_RETRY_DELAY = env.float('BLOG_TASK_RETRY_DELAY', 1)
+
+EMAIL_BACKEND = env.str('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+
+BLOG_SLOW_REQUEST_SECONDS = env.float('BLOG_SLOW_REQUEST_SECONDS', 1)
+BLOG_METRICS_TOKEN = env.str('BLOG_METRICS_TOKEN', '')
@@ -2,13 +2,21 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from blog import views
+from blog import api, metrics, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('page/<int:page>', views.index, name='index'),
     path('tag/<slug:tag_slug>/', views.tag_filter, name='tag_filter'),
     path('post/<slug:slug>', views.post_detail, name='post_detail'),
+    path('post/<slug:slug>/comments', views.post_comments, name='post_comments'),
+    path('api/posts/', api.posts, name='api_posts'),
+    path('api/posts/<slug:slug>/', api.post_detail, name='api_post_detail'),
+    path('api/posts/<slug:slug>/comments/', api.post_comments, name='api_post_comments'),
+    path('api/tags/<slug:tag_slug>/posts/', api.tag_posts, name='api_tag_posts'),
+    path('post/<slug:slug>/comment', views.add_comment, name='add_comment'),
+    path('post/<slug:slug>/like', views.like_post, name='like_post'),
+    path('search/', views.search, name='search'),
+    path('metrics', metrics.metrics, name='metrics'),
     path('contacts/', views.contacts, name='contacts'),
     path('', views.index, name='index'),
 ]